@@ -26,11 +26,25 @@ def create_app(config_name='default'):
     
     logger = logging.getLogger(__name__)
     
+    # Indexes for content-hash deduplication of uploads and chunks
+    try:
+        from app.models.pdf import PDFDocument
+        from app.models.vectorstore import VectorStore
+        with app.app_context():
+            PDFDocument.ensure_indexes()
+            VectorStore.ensure_indexes()
+    except Exception as e:
+        logger.warning(f"⚠️  Could not create MongoDB indexes: {str(e)}")
+    
     # Initialize FAISS Vector Store
     logger.info("🚀 Initializing FAISS Vector Store...")
     try:
         from app.utils.faiss_store import faiss_store
         with app.app_context():
+            # Catch up with PDFs added or deleted in MongoDB since the last checkpoint
+            if app.config['FAISS_SYNC_ON_STARTUP']:
+                faiss_store.sync_from_mongodb()
+            
             stats = faiss_store.get_stats()
             logger.info(f"✅ FAISS initialized with {stats['total_vectors']} vectors from {stats['total_pdfs']} PDFs")
             
@@ -32,7 +32,48 @@ class Config:
     
     # Embedding Configuration
     EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+    EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch').lower()  # torch or onnx
+    EMBEDDING_ONNX_PATH = os.getenv('EMBEDDING_ONNX_PATH', os.path.join('onnx_model', 'model.onnx'))  # model_int8.onnx for int8
+    EMBEDDING_ONNX_THREADS = int(os.getenv('EMBEDDING_ONNX_THREADS', 0))  # ONNX Runtime intra-op threads; 0 uses its default
     VECTOR_DIMENSION = 384
+    VECTORSTORE_MATRIX_CACHE_PDFS = int(os.getenv('VECTORSTORE_MATRIX_CACHE_PDFS', 64))  # PDFs cached for MongoDB fallback search
+    VECTORSTORE_INSERT_BATCH = int(os.getenv('VECTORSTORE_INSERT_BATCH', 500))  # Chunks per insert_many during ingestion
+    QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', 2048))  # Query embeddings kept in memory; 0 disables
+    QUERY_EMBEDDING_CACHE_TTL = float(os.getenv('QUERY_EMBEDDING_CACHE_TTL', 3600))  # Seconds a cached query embedding lives; 0 keeps it
+    QUERY_BATCH_WINDOW_MS = float(os.getenv('QUERY_BATCH_WINDOW_MS', 5))  # Wait for concurrent queries to batch; 0 disables
+    QUERY_BATCH_MAX_SIZE = int(os.getenv('QUERY_BATCH_MAX_SIZE', 32))  # Queries encoded per batch at most
+    EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', os.path.join('embedding_cache', 'embeddings.db'))  # On-disk chunk embedding cache
+    EMBEDDING_CACHE_MAX_MB = int(os.getenv('EMBEDDING_CACHE_MAX_MB', 512))  # Size limit before LRU eviction; 0 disables
+    INGEST_EMBEDDING_WORKERS = int(os.getenv('INGEST_EMBEDDING_WORKERS', 1))  # Processes embedding uploaded PDFs; 0 embeds in the request
+    INGEST_EMBEDDING_THREADS = int(os.getenv('INGEST_EMBEDDING_THREADS', 2))  # Torch/ONNX threads per ingestion process
+    INGEST_EMBEDDING_TASK_SIZE = int(os.getenv('INGEST_EMBEDDING_TASK_SIZE', 256))  # Chunks per pool task, so uploads share the pool
+    EMBEDDING_STORAGE_DTYPE = os.getenv('EMBEDDING_STORAGE_DTYPE', 'float32').lower()  # float32 or float16 binary in MongoDB
+    
+    # FAISS Configuration
+    FAISS_CHECKPOINT_INTERVAL = int(os.getenv('FAISS_CHECKPOINT_INTERVAL', 50))  # WAL records between checkpoints
+    # flat, ivf or hnsw; chosen per PDF partition, so it only affects PDFs with
+    # at least FAISS_MIN_TRAIN_SIZE chunks. Other PDFs, and unfiltered searches
+    # over them, are still exact scans.
+    FAISS_INDEX_TYPE = os.getenv('FAISS_INDEX_TYPE', 'flat').lower()
+    FAISS_MIN_TRAIN_SIZE = int(os.getenv('FAISS_MIN_TRAIN_SIZE', 10000))  # Smaller partitions stay flat
+    FAISS_IVF_NLIST = int(os.getenv('FAISS_IVF_NLIST', 1024))
+    FAISS_IVF_NPROBE = int(os.getenv('FAISS_IVF_NPROBE', 16))
+    FAISS_HNSW_M = int(os.getenv('FAISS_HNSW_M', 32))
+    FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv('FAISS_HNSW_EF_CONSTRUCTION', 200))
+    FAISS_HNSW_EF_SEARCH = int(os.getenv('FAISS_HNSW_EF_SEARCH', 64))
+    FAISS_QUANTIZATION = os.getenv('FAISS_QUANTIZATION', 'none').lower()  # none, sq8, fp16 or pq (PDFs under 9984 chunks use sq8)
+    FAISS_PQ_M = int(os.getenv('FAISS_PQ_M', 48))  # PQ sub-quantizers (bytes per vector), must divide 384
+    FAISS_RERANK_FACTOR = int(os.getenv('FAISS_RERANK_FACTOR', 4))  # Candidates per result re-scored exactly; 0 disables
+    FAISS_MMAP = os.getenv('FAISS_MMAP', 'true').lower() == 'true'  # Memory-map partition files on load
+    FAISS_SHARED = os.getenv('FAISS_SHARED', 'false').lower() == 'true'  # Workers share one checkpoint (use with FAISS_MMAP)
+    FAISS_SYNC_INTERVAL = float(os.getenv('FAISS_SYNC_INTERVAL', 1.0))  # Max seconds before a worker sees another's writes
+    FAISS_INDEX_PATH = os.getenv('FAISS_INDEX_PATH', 'faiss_data')
+    FAISS_REBUILD_BLOCK = int(os.getenv('FAISS_REBUILD_BLOCK', 4096))  # Vectors streamed from MongoDB per block during rebuilds
+    FAISS_SYNC_ON_STARTUP = os.getenv('FAISS_SYNC_ON_STARTUP', 'true').lower() == 'true'  # Catch up with MongoDB at startup
+    FAISS_SNAPSHOT_RETAIN = int(os.getenv('FAISS_SNAPSHOT_RETAIN', 3))  # Snapshot generations kept for rollback
+    FAISS_COMPACT_RATIO = float(os.getenv('FAISS_COMPACT_RATIO', 0.3))  # Tombstoned share that triggers compaction; 0 disables
+    FAISS_SHARDS = [address for address in os.getenv('FAISS_SHARDS', '').split(',') if address]  # host:port or socket paths
+    FAISS_SHARD_AUTHKEY = os.getenv('FAISS_SHARD_AUTHKEY', '')  # Required with FAISS_SHARDS; 32+ characters for non-loopback TCP
     
     # Logging Configuration
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -9,8 +9,14 @@ class PDFDocument:
     
     @staticmethod
     def create(user_id, filename, file_path, file_size, text_content, metadata=None):
-        """Create a new PDF document entry"""
+        """
+        Create a new PDF document entry; it owns its extracted text and vectors
+        The entry has no content hash until mark_processed, so uploads of the
+        same file cannot reuse it before its vectors are stored
+        """
+        pdf_id = ObjectId()
         pdf_data = {
+            '_id': pdf_id,
             'user_id': ObjectId(user_id),
             'filename': filename,
             'file_path': file_path,
@@ -18,6 +24,43 @@ class PDFDocument:
             'text_content': text_content,
             'page_count': metadata.get('page_count', 0) if metadata else 0,
             'metadata': metadata or {},
+            'content_hash': None,
+            'content_id': pdf_id,
+            'created_at': datetime.utcnow(),
+            'is_active': True,
+            'processed': False
+        }
+        PDFDocument.collection.insert_one(pdf_data)
+        return pdf_data
+    
+    @staticmethod
+    def mark_processed(pdf, content_hash):
+        """Record that a PDF's chunks and vectors are stored, making it available for deduplication"""
+        PDFDocument.collection.update_one(
+            {'_id': pdf['_id']},
+            {'$set': {'content_hash': content_hash, 'processed': True}}
+        )
+        pdf['content_hash'] = content_hash
+        pdf['processed'] = True
+        return pdf
+    
+    @staticmethod
+    def create_reference(user_id, filename, source):
+        """
+        Create a user's entry for a file that was already ingested
+        The entry points at the source's file, text and vectors instead of
+        copying them
+        """
+        pdf_data = {
+            'user_id': ObjectId(user_id),
+            'filename': filename,
+            'file_path': source['file_path'],
+            'file_size': source['file_size'],
+            'text_content': '',
+            'page_count': source.get('page_count', 0),
+            'metadata': source.get('metadata', {}),
+            'content_hash': source['content_hash'],
+            'content_id': ObjectId(PDFDocument.content_id(source)),
             'created_at': datetime.utcnow(),
             'is_active': True,
             'processed': True
@@ -26,6 +69,38 @@ class PDFDocument:
         pdf_data['_id'] = result.inserted_id
         return pdf_data
     
+    @staticmethod
+    def content_id(pdf):
+        """ID the PDF's chunks and vectors are stored under"""
+        return str(pdf.get('content_id') or pdf['_id'])
+    
+    @staticmethod
+    def find_by_content_hash(content_hash):
+        """An active, fully processed PDF with the given file hash, if any"""
+        return PDFDocument.collection.find_one({'content_hash': content_hash, 'is_active': True, 'processed': True})
+    
+    @staticmethod
+    def has_content_references(content_id):
+        """Whether any active PDF still uses the vectors stored under content_id"""
+        return PDFDocument.collection.count_documents(
+            {'content_id': ObjectId(content_id), 'is_active': True},
+            limit=1
+        ) > 0
+    
+    @staticmethod
+    def get_text(pdf):
+        """Extracted text of a PDF, read from the source entry for references"""
+        if pdf.get('text_content') or PDFDocument.content_id(pdf) == str(pdf['_id']):
+            return pdf.get('text_content', '')
+        source = PDFDocument.get_by_id(PDFDocument.content_id(pdf))
+        return source.get('text_content', '') if source else ''
+    
+    @staticmethod
+    def ensure_indexes():
+        """Indexes backing content-hash lookups"""
+        PDFDocument.collection.create_index('content_hash')
+        PDFDocument.collection.create_index('content_id')
+    
     @staticmethod
     def get_by_id(pdf_id):
         """Get PDF by ID"""
@@ -70,5 +145,5 @@ class PDFDocument:
             'created_at': pdf['created_at'].isoformat() + 'Z'
         }
         if include_content:
-            result['text_content'] = pdf.get('text_content', '')
+            result['text_content'] = PDFDocument.get_text(pdf)
         return result
\ No newline at end of file
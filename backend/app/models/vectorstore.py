@@ -1,23 +1,53 @@
 from app import mongo
-from bson import ObjectId
+from app.config import Config
+from app.utils.lru_cache import LRUCache
+from bson import Binary, ObjectId
 from datetime import datetime
+from pymongo import UpdateOne
 import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Little-endian numpy dtypes for packed embeddings
+EMBEDDING_DTYPES = {'float32': '<f4', 'float16': '<f2'}
+
 
 class VectorStore:
     """Vector store model for embeddings"""
     collection = mongo.db.vectorstore
 
+    # Per-PDF normalized embedding matrices for the fallback search
+    matrix_cache = LRUCache(Config.VECTORSTORE_MATRIX_CACHE_PDFS)
+
+    @staticmethod
+    def encode_embedding(embedding, dtype=None):
+        """Pack an embedding as little-endian binary; returns (value, dtype name)"""
+        dtype = dtype or Config.EMBEDDING_STORAGE_DTYPE
+        packed = np.asarray(embedding, dtype=EMBEDDING_DTYPES[dtype]).tobytes()
+        return Binary(packed), dtype
+
+    @staticmethod
+    def decode_embedding(vector):
+        """
+        Embedding of a vector document as a numpy array
+        Packed embeddings are read in place with np.frombuffer; documents
+        written before binary storage still hold a list of doubles
+        """
+        embedding = vector['embedding']
+        if isinstance(embedding, (bytes, bytearray)):
+            return np.frombuffer(embedding, dtype=EMBEDDING_DTYPES[vector.get('embedding_dtype', 'float32')])
+        return np.asarray(embedding, dtype=np.float32)
+
     @staticmethod
     def create(pdf_id, chunk_text, embedding, chunk_index, metadata=None):
         """Create a new vector entry"""
+        packed, dtype = VectorStore.encode_embedding(embedding)
         vector_data = {
             'pdf_id': ObjectId(pdf_id),
             'chunk_text': chunk_text,
-            'embedding': embedding.tolist() if isinstance(embedding, np.ndarray) else embedding,
+            'embedding': packed,
+            'embedding_dtype': dtype,
             'chunk_index': chunk_index,
             'metadata': metadata or {},
             'created_at': datetime.utcnow()
@@ -25,36 +55,165 @@ class VectorStore:
 
         result = VectorStore.collection.insert_one(vector_data)
         vector_data['_id'] = result.inserted_id
+        VectorStore.matrix_cache.pop(str(pdf_id))
         return vector_data
 
     @staticmethod
-    def search_similar(query_embedding, pdf_id=None, top_k=5):
-        """Search for similar vectors with optional PDF filtering"""
-        query_vec = np.array(query_embedding)
+    def create_many(pdf_id, chunks, embeddings, chunk_indices=None, metadatas=None, batch_size=None,
+                    chunk_hashes=None, embedding_model=None):
+        """
+        Create vector entries for a PDF's chunks with a few bulk inserts
+
+        Args:
+            pdf_id: PDF the chunks belong to
+            chunks: Chunk texts
+            embeddings: One embedding per chunk
+            chunk_indices: Chunk positions (defaults to 0..n-1)
+            metadatas: Optional per-chunk metadata dicts
+            batch_size: Documents per insert_many (defaults to VECTORSTORE_INSERT_BATCH)
+            chunk_hashes: Optional per-chunk text hashes for embedding reuse
+            embedding_model: Model that produced the embeddings; hashes are only
+                reused for the same model
+
+        Returns:
+            Inserted ids in chunk order
+        """
+        batch_size = max(1, batch_size or Config.VECTORSTORE_INSERT_BATCH)
+        if chunk_indices is None:
+            chunk_indices = range(len(chunks))
+        if metadatas is None:
+            metadatas = [None] * len(chunks)
+        if chunk_hashes is None:
+            chunk_hashes = [None] * len(chunks)
+
+        created_at = datetime.utcnow()
+        documents = []
+        for chunk_text, embedding, chunk_index, metadata, chunk_hash in zip(
+            chunks, embeddings, chunk_indices, metadatas, chunk_hashes
+        ):
+            packed, dtype = VectorStore.encode_embedding(embedding)
+            document = {
+                'pdf_id': ObjectId(pdf_id),
+                'chunk_text': chunk_text,
+                'embedding': packed,
+                'embedding_dtype': dtype,
+                'chunk_index': chunk_index,
+                'metadata': metadata or {},
+                'created_at': created_at
+            }
+            if chunk_hash and embedding_model:
+                document['chunk_hash'] = chunk_hash
+                document['embedding_model'] = embedding_model
+            documents.append(document)
+
+        inserted_ids = []
+        for start in range(0, len(documents), batch_size):
+            # Unordered so the server can apply a batch's documents in parallel
+            result = VectorStore.collection.insert_many(documents[start:start + batch_size], ordered=False)
+            inserted_ids.extend(result.inserted_ids)
+
+        VectorStore.matrix_cache.pop(str(pdf_id))
+        return inserted_ids
+
+    @staticmethod
+    def embeddings_by_chunk_hash(chunk_hashes, embedding_model):
+        """
+        Stored embeddings for chunks whose text hash is already known, keyed by hash
+        Only vectors from embedding_model (name and backend) are returned, so a
+        model or backend change never mixes vector spaces
+        """
+        embeddings = {}
+        cursor = VectorStore.collection.find(
+            {'chunk_hash': {'$in': list(set(chunk_hashes))}, 'embedding_model': embedding_model},
+            {'chunk_hash': 1, 'embedding': 1, 'embedding_dtype': 1}
+        )
+        for vector in cursor:
+            embeddings.setdefault(vector['chunk_hash'], VectorStore.decode_embedding(vector))
+        return embeddings
+
+    @staticmethod
+    def ensure_indexes():
+        """Indexes backing per-PDF scans and chunk-hash lookups"""
+        VectorStore.collection.create_index([('pdf_id', 1), ('chunk_index', 1)])
+        VectorStore.collection.create_index([('chunk_hash', 1), ('embedding_model', 1)], sparse=True)
+
+    @staticmethod
+    def _pdf_matrix(pdf_id):
+        """
+        (matrix, chunk texts, chunk indices) for a PDF, matrix being its
+        L2-normalized (n, d) float32 embeddings in chunk order
+        Served from the LRU cache while the PDF's document count is
+        unchanged, so chunks written or deleted by another worker are seen
+        """
+        pdf_id = str(pdf_id)
+        count = VectorStore.collection.count_documents({'pdf_id': ObjectId(pdf_id)})
+
+        cached = VectorStore.matrix_cache.get(pdf_id)
+        if cached is not None and len(cached[1]) == count:
+            return cached
+
+        vectors = list(VectorStore.collection.find(
+            {'pdf_id': ObjectId(pdf_id)},
+            {'embedding': 1, 'embedding_dtype': 1, 'chunk_text': 1, 'chunk_index': 1}
+        ).sort('chunk_index', 1))
 
-        # Build query - if pdf_id is None, search all PDFs
-        if pdf_id:
-            query = {'pdf_id': ObjectId(pdf_id)} if isinstance(pdf_id, str) else {'pdf_id': pdf_id}
+        if vectors:
+            matrix = np.stack([VectorStore.decode_embedding(vec) for vec in vectors]).astype(np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= np.where(norms == 0, 1, norms)
         else:
-            query = {}
+            matrix = np.empty((0, Config.VECTOR_DIMENSION), dtype=np.float32)
 
-        vectors = list(VectorStore.collection.find(query))
+        entry = (
+            matrix,
+            [vec.get('chunk_text', '') for vec in vectors],
+            [vec.get('chunk_index') for vec in vectors]
+        )
+        VectorStore.matrix_cache.put(pdf_id, entry)
+        return entry
 
-        if not vectors:
+    @staticmethod
+    def _top_k(query_vec, pdf_id, top_k):
+        """Score a normalized query against one PDF's matrix and keep the best top_k"""
+        matrix, chunks, chunk_indices = VectorStore._pdf_matrix(pdf_id)
+        if not len(matrix):
             return []
 
+        scores = matrix @ query_vec
+        if top_k < len(scores):
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best])]
+
+        return [
+            {
+                'chunk': chunks[i],
+                'similarity': float(scores[i]),
+                'pdf_id': str(pdf_id),
+                'chunk_index': chunk_indices[i]
+            }
+            for i in best
+        ]
+
+    @staticmethod
+    def _normalize_query(query_embedding):
+        """Query as a unit-length float32 vector so dot products are cosine similarities"""
+        query_vec = np.asarray(query_embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query_vec)
+        return query_vec / norm if norm else query_vec
+
+    @staticmethod
+    def search_similar(query_embedding, pdf_id=None, top_k=5):
+        """Search for similar vectors with optional PDF filtering"""
+        query_vec = VectorStore._normalize_query(query_embedding)
+
+        # Without a filter every PDF is scored and the best results merged
+        pdf_ids = [pdf_id] if pdf_id else VectorStore.collection.distinct('pdf_id')
+
         similarities = []
-        for vec in vectors:
-            stored_vec = np.array(vec['embedding'])
-            similarity = np.dot(query_vec, stored_vec) / (
-                np.linalg.norm(query_vec) * np.linalg.norm(stored_vec)
-            )
-            similarities.append({
-                'chunk': vec.get('chunk_text', ''),
-                'similarity': float(similarity),
-                'pdf_id': str(vec['pdf_id']),
-                'chunk_index': vec.get('chunk_index')
-            })
+        for candidate in pdf_ids:
+            similarities.extend(VectorStore._top_k(query_vec, candidate, top_k))
 
         similarities.sort(key=lambda x: x['similarity'], reverse=True)
         return similarities[:top_k]
@@ -72,10 +231,11 @@ class VectorStore:
         Returns:
             List of results with PDF source information
         """
+        query_vec = VectorStore._normalize_query(query_embedding)
         all_results = []
 
         for pdf_id in pdf_ids:
-            results = VectorStore.search_similar(query_embedding, pdf_id, top_k_per_pdf)
+            results = VectorStore._top_k(query_vec, pdf_id, top_k_per_pdf)
             for result in results:
                 result['source_pdf_id'] = pdf_id
                 all_results.append(result)
@@ -98,8 +258,46 @@ class VectorStore:
     def delete_by_pdf(pdf_id):
         """Delete all vectors for a PDF"""
         result = VectorStore.collection.delete_many({'pdf_id': ObjectId(pdf_id)})
+        VectorStore.matrix_cache.pop(str(pdf_id))
         return result.deleted_count
 
+    @staticmethod
+    def migrate_embeddings(batch_size=1000, dtype=None):
+        """
+        Convert embeddings stored as lists of doubles to packed binary
+
+        Args:
+            batch_size: Documents converted per bulk write
+            dtype: Storage dtype (defaults to EMBEDDING_STORAGE_DTYPE)
+
+        Returns:
+            Number of documents converted
+        """
+        converted = 0
+        batch = []
+
+        cursor = VectorStore.collection.find(
+            {'embedding': {'$type': 'array'}},
+            {'embedding': 1}
+        ).batch_size(batch_size)
+
+        for vector in cursor:
+            packed, vector_dtype = VectorStore.encode_embedding(vector['embedding'], dtype)
+            batch.append(UpdateOne(
+                {'_id': vector['_id']},
+                {'$set': {'embedding': packed, 'embedding_dtype': vector_dtype}}
+            ))
+
+            if len(batch) >= batch_size:
+                converted += VectorStore.collection.bulk_write(batch, ordered=False).modified_count
+                batch = []
+                logger.info(f"Converted {converted} embeddings to binary")
+
+        if batch:
+            converted += VectorStore.collection.bulk_write(batch, ordered=False).modified_count
+
+        return converted
+
     @staticmethod
     def get_all_vectors(skip=0, limit=50):
         """Get all vectors with pagination"""
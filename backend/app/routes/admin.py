@@ -5,6 +5,7 @@ from app.models.session import Session
 from app.models.pdf import PDFDocument
 from app.models.vectorstore import VectorStore
 from app.utils.decorators import token_required, role_required
+from app.utils.embeddings import EmbeddingGenerator
 from app.utils.faiss_store import faiss_store
 import logging
 
@@ -223,11 +224,15 @@ def delete_pdf(pdf_id):
         
         # Delete from MongoDB
         PDFDocument.delete_pdf(pdf_id)
-        VectorStore.delete_by_pdf(pdf_id)
         
-        # Remove from FAISS
-        logger.info(f"Removing vectors from FAISS for PDF {pdf_id}")
-        faiss_store.remove_pdf_vectors(pdf_id)
+        # Vectors are shared by every upload of the same file; drop them with the last one
+        content_id = PDFDocument.content_id(pdf)
+        if not PDFDocument.has_content_references(content_id):
+            VectorStore.delete_by_pdf(content_id)
+            
+            # Remove from FAISS
+            logger.info(f"Removing vectors from FAISS for PDF {content_id}")
+            faiss_store.remove_pdf_vectors(content_id)
         
         logger.info(f"PDF {pdf_id} deleted by admin")
         
@@ -312,25 +317,55 @@ def get_vectorstore_stats():
 @token_required
 @role_required('admin')
 def rebuild_faiss_index():
-    """Rebuild FAISS index from MongoDB (admin only)"""
+    """Start a background FAISS index rebuild from MongoDB (admin only)"""
     try:
         logger.info("Starting FAISS index rebuild from MongoDB...")
         
-        success = faiss_store.rebuild_from_mongodb()
+        # The live index keeps serving searches until the rebuilt one is swapped in
+        started = faiss_store.rebuild_from_mongodb(background=True)
         
-        if success:
-            stats = faiss_store.get_stats()
+        if started:
             return jsonify({
-                'message': 'FAISS index rebuilt successfully',
-                'stats': stats
-            }), 200
+                'message': 'FAISS index rebuild started',
+                'rebuild': faiss_store.rebuild_status()
+            }), 202
         else:
-            return jsonify({'error': 'Failed to rebuild FAISS index'}), 500
+            return jsonify({
+                'error': 'A FAISS index rebuild is already running',
+                'rebuild': faiss_store.rebuild_status()
+            }), 409
     
     except Exception as e:
         logger.error(f"Rebuild FAISS index error: {str(e)}")
         return jsonify({'error': 'Failed to rebuild FAISS index', 'details': str(e)}), 500
 
+@admin_bp.route('/vectorstore/rebuild', methods=['GET'])
+@token_required
+@role_required('admin')
+def get_rebuild_status():
+    """Get progress and ETA of the running (or last) FAISS rebuild"""
+    try:
+        return jsonify({'rebuild': faiss_store.rebuild_status()}), 200
+    
+    except Exception as e:
+        logger.error(f"Get rebuild status error: {str(e)}")
+        return jsonify({'error': 'Failed to get rebuild status'}), 500
+
+@admin_bp.route('/vectorstore/rebuild', methods=['DELETE'])
+@token_required
+@role_required('admin')
+def cancel_rebuild():
+    """Cancel the running FAISS rebuild; the live index is kept"""
+    try:
+        if faiss_store.cancel_rebuild():
+            return jsonify({'message': 'FAISS index rebuild cancelled'}), 200
+        else:
+            return jsonify({'error': 'No FAISS index rebuild is running'}), 404
+    
+    except Exception as e:
+        logger.error(f"Cancel rebuild error: {str(e)}")
+        return jsonify({'error': 'Failed to cancel rebuild'}), 500
+
 # ==================== SYSTEM STATISTICS ====================
 
 @admin_bp.route('/stats', methods=['GET'])
@@ -356,7 +391,11 @@ def get_stats():
             'total_chats': total_chats,
             'total_pdfs': total_pdfs,
             'total_vectors': total_vectors,
-            'faiss': faiss_stats
+            'faiss': faiss_stats,
+            'embedding_cache': EmbeddingGenerator.cache_stats(),
+            'chunk_embedding_cache': EmbeddingGenerator.chunk_cache_stats(),
+            'embedding_batcher': EmbeddingGenerator.batcher_stats(),
+            'embedding_pool': EmbeddingGenerator.pool_stats()
         }), 200
     
     except Exception as e:
@@ -127,6 +127,7 @@ def send_message():
             context_type = 'pdf_multiple' if len(pdf_ids) > 1 else 'pdf'
             
             # Verify all PDFs belong to user (unless admin)
+            content_pdf_ids = {}  # Maps the ID vectors are stored under to the selected PDF
             for pid in pdf_ids:
                 pdf = PDFDocument.get_by_id(pid)
                 if not pdf:
@@ -139,6 +140,7 @@ def send_message():
                     'id': pid,
                     'filename': pdf['filename']
                 })
+                content_pdf_ids.setdefault(PDFDocument.content_id(pdf), pid)
             
             # Generate query embedding
             logger.info("Generating query embedding...")
@@ -146,7 +148,9 @@ def send_message():
             
             # Search with FAISS and automatic fallback to MongoDB
             logger.info(f"🔍 Searching across {len(pdf_ids)} PDF(s)...")
-            similar_chunks = search_with_faiss_fallback(query_embedding, pdf_ids, top_k_per_pdf=3)
+            similar_chunks = search_with_faiss_fallback(query_embedding, list(content_pdf_ids), top_k_per_pdf=3)
+            for chunk in similar_chunks:
+                chunk['pdf_id'] = content_pdf_ids.get(chunk['pdf_id'], chunk['pdf_id'])
             search_method = 'faiss' if similar_chunks else 'mongodb'
             
             logger.info(f"Found {len(similar_chunks)} similar chunks using {search_method}")
@@ -5,6 +5,7 @@ from app.utils.pdf_processor import PDFProcessor
 from app.utils.embeddings import EmbeddingGenerator
 from app.utils.decorators import token_required
 from app.utils.faiss_store import faiss_store
+from werkzeug.utils import secure_filename
 import logging
 import numpy as np
 
@@ -16,6 +17,7 @@ student_bp = Blueprint('student', __name__)
 @token_required
 def upload_pdf():
     """Upload and process a PDF document with FAISS integration"""
+    pdf_id = None
     try:
         user_id = request.current_user['user_id']
         
@@ -32,6 +34,22 @@ def upload_pdf():
         if not PDFProcessor.allowed_file(file.filename, current_app.config['ALLOWED_EXTENSIONS']):
             return jsonify({'error': 'Invalid file type. Only PDF files are allowed'}), 400
         
+        # Identical files share one stored copy, extraction and set of vectors
+        content_hash = PDFProcessor.file_hash(file)
+        existing = PDFDocument.find_by_content_hash(content_hash)
+        if existing:
+            pdf = PDFDocument.create_reference(user_id, secure_filename(file.filename), existing)
+            
+            logger.info(f"PDF {file.filename} matches {PDFDocument.content_id(existing)}; reusing its chunks and vectors")
+            
+            return jsonify({
+                'message': 'PDF uploaded and processed successfully',
+                'pdf': PDFDocument.to_dict(pdf),
+                'chunks_created': 0,
+                'deduplicated': True,
+                'faiss_stats': faiss_store.get_stats()
+            }), 201
+        
         # Save file
         file_path, filename, file_size = PDFProcessor.save_file(file, current_app.config['UPLOAD_FOLDER'])
         
@@ -53,22 +71,33 @@ def upload_pdf():
         # Process text into chunks
         chunks = PDFProcessor.chunk_text(text_content)
         
-        # Generate embeddings for chunks
-        logger.info(f"Generating embeddings for {len(chunks)} chunks...")
-        embeddings = EmbeddingGenerator.generate_embeddings_batch(chunks)
-        embeddings_array = np.array(embeddings)
+        # Reuse embeddings the current model already stored for other PDFs' chunks;
+        # these take precedence over the chunk cache, which only sees the misses
+        chunk_hashes = [PDFProcessor.chunk_hash(chunk) for chunk in chunks]
+        embedding_model = EmbeddingGenerator.model_name()
+        known = VectorStore.embeddings_by_chunk_hash(chunk_hashes, embedding_model)
+        missing = [idx for idx, chunk_hash in enumerate(chunk_hashes) if chunk_hash not in known]
+        
+        # Generate embeddings for the remaining chunks
+        logger.info(f"Generating embeddings for {len(missing)} of {len(chunks)} chunks...")
+        embeddings_array = np.empty((len(chunks), current_app.config['VECTOR_DIMENSION']), dtype=np.float32)
+        if missing:
+            embeddings_array[missing] = EmbeddingGenerator.generate_embeddings_batch([chunks[idx] for idx in missing])
+        for idx, chunk_hash in enumerate(chunk_hashes):
+            if chunk_hash in known:
+                embeddings_array[idx] = known[chunk_hash]
         
         # Store embeddings in MongoDB (for backup and persistence)
-        chunk_indices = []
-        for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            VectorStore.create(
-                pdf_id=pdf_id,
-                chunk_text=chunk,
-                embedding=embedding,
-                chunk_index=idx,
-                metadata={'page_range': f"Chunk {idx + 1}"}
-            )
-            chunk_indices.append(idx)
+        chunk_indices = list(range(len(chunks)))
+        VectorStore.create_many(
+            pdf_id=pdf_id,
+            chunks=chunks,
+            embeddings=embeddings_array,
+            chunk_indices=chunk_indices,
+            metadatas=[{'page_range': f"Chunk {idx + 1}"} for idx in chunk_indices],
+            chunk_hashes=chunk_hashes,
+            embedding_model=embedding_model
+        )
         
         # Add to FAISS for fast similarity search
         logger.info(f"Adding {len(chunks)} vectors to FAISS index...")
@@ -82,6 +111,9 @@ def upload_pdf():
         if not success:
             logger.warning("Failed to add vectors to FAISS, but data is in MongoDB")
         
+        # Only now can later uploads of the same file reuse this one
+        PDFDocument.mark_processed(pdf, content_hash)
+        
         logger.info(f"PDF uploaded and processed: {filename} ({len(chunks)} chunks)")
         
         # Get FAISS stats
@@ -96,8 +128,19 @@ def upload_pdf():
     
     except Exception as e:
         logger.error(f"Upload PDF error: {str(e)}")
+        if pdf_id:
+            _discard_upload(pdf_id)
         return jsonify({'error': 'Failed to upload PDF', 'details': str(e)}), 500
 
+def _discard_upload(pdf_id):
+    """Deactivate a PDF whose ingestion failed and drop any vectors already stored for it"""
+    try:
+        PDFDocument.delete_pdf(pdf_id)
+        VectorStore.delete_by_pdf(pdf_id)
+        faiss_store.remove_pdf_vectors(pdf_id)
+    except Exception as e:
+        logger.error(f"Failed to clean up PDF {pdf_id} after upload error: {str(e)}")
+
 @student_bp.route('/pdfs', methods=['GET'])
 @token_required
 def get_pdfs():
@@ -142,11 +185,15 @@ def delete_pdf(pdf_id):
         
         # Delete from MongoDB
         PDFDocument.delete_pdf(pdf_id)
-        VectorStore.delete_by_pdf(pdf_id)
         
-        # Remove from FAISS
-        logger.info(f"Removing vectors from FAISS for PDF {pdf_id}")
-        faiss_store.remove_pdf_vectors(pdf_id)
+        # Vectors are shared by every upload of the same file; drop them with the last one
+        content_id = PDFDocument.content_id(pdf)
+        if not PDFDocument.has_content_references(content_id):
+            VectorStore.delete_by_pdf(content_id)
+            
+            # Remove from FAISS
+            logger.info(f"Removing vectors from FAISS for PDF {content_id}")
+            faiss_store.remove_pdf_vectors(content_id)
         
         logger.info(f"PDF {pdf_id} deleted")
         
@@ -1,20 +1,24 @@
-from .firebase_auth import FirebaseAuth
-from .jwt_handler import JWTHandler
-from .pdf_processor import PDFProcessor
-from .gemini_client import GeminiClient
-from .embeddings import EmbeddingGenerator
-from .validators import Validators
-from .decorators import token_required, role_required
-from .faiss_store import faiss_store
+import importlib
 
-__all__ = [
-    'FirebaseAuth',
-    'JWTHandler',
-    'PDFProcessor',
-    'GeminiClient',
-    'EmbeddingGenerator',
-    'Validators',
-    'token_required',
-    'role_required',
-    'faiss_store'
-]
\ No newline at end of file
+# Imported on first access, so loading one submodule (e.g. in an embedding
+# pool process) does not also build the FAISS store and the other clients
+_exports = {
+    'FirebaseAuth': '.firebase_auth',
+    'JWTHandler': '.jwt_handler',
+    'PDFProcessor': '.pdf_processor',
+    'GeminiClient': '.gemini_client',
+    'EmbeddingGenerator': '.embeddings',
+    'Validators': '.validators',
+    'token_required': '.decorators',
+    'role_required': '.decorators',
+    'faiss_store': '.faiss_store'
+}
+
+__all__ = list(_exports)
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_exports[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,496 @@
+import json
+import os
+import shutil
+import uuid
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.utils.file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+class ChunkMetadataStore:
+    """
+    Columnar, memory-mapped chunk metadata keyed by FAISS id
+    Row i holds the metadata of the vector with global id i:
+    pdf ordinal and chunk index live in fixed-width int32 columns,
+    chunk text in a single UTF-8 blob addressed by an int64 end-offset column.
+    Rows of quantized partitions also keep their exact normalized float32
+    vector (used to re-score quantized search) in a vector column, which an
+    int64 column maps each row into (-1 for rows without one). Rows are
+    append-only; deleting a PDF tombstones its ordinal.
+    Every flush publishes a numbered manifest (a snapshot generation) that
+    pins a row count within a column set. Older manifests stay valid because
+    they only see a prefix of the rows; rewriting the rows (reset) starts a
+    new column set directory instead of touching the published one.
+    Column files are never truncated, since other processes may have them
+    mapped: a flush appends only when the files end exactly at the loaded
+    rows, and otherwise copies the rows into a new column set.
+    A new store can spill rows to a private building column set before
+    its first flush, which publishes that set under a generation name.
+    """
+
+    PDF_COLUMN = 'pdf_ordinal.i32'
+    CHUNK_COLUMN = 'chunk_index.i32'
+    OFFSET_COLUMN = 'text_end.i64'
+    TEXT_BLOB = 'text.bin'
+    VECTOR_COLUMN = 'vectors.f32'
+    VECTOR_ROW_COLUMN = 'vector_row.i64'
+    MANIFEST_DIR = 'manifests'
+    LEGACY_MANIFEST = 'manifest.json'  # Single unversioned manifest of older stores
+    LOCK_FILE = 'columns.lock'
+    BUILD_PREFIX = 'building-'  # Column sets spilled by a store that has not published them yet
+
+    def __init__(self, path: str, dimension: int):
+        self.path = path
+        self.dimension = dimension
+        Path(os.path.join(self.path, self.MANIFEST_DIR)).mkdir(parents=True, exist_ok=True)
+        self.generation = 0  # Snapshot generation currently loaded (0: none)
+        self.columns = ''  # Column set directory ('' for the legacy flat layout)
+        self._reset_memory()
+        self._new_columns_on_flush = True  # Until a published generation is loaded
+        self.extra = {}  # Caller-owned values committed with the manifest
+        # Serializes flushes of every process sharing this directory
+        self._lock = FileLock(os.path.join(self.path, self.LOCK_FILE))
+
+    def _reset_memory(self):
+        """Drop mapped columns and pending rows"""
+        self.pdfs = []  # Ordinal -> pdf_id (None once deleted)
+        self.pdf_ordinals = {}  # Live pdf_id -> ordinal
+        self._base_rows = 0
+        self._pdf_col = np.empty(0, dtype=np.int32)
+        self._chunk_col = np.empty(0, dtype=np.int32)
+        self._end_col = np.empty(0, dtype=np.int64)
+        self._text = np.empty(0, dtype=np.uint8)
+        self._vectors = np.empty((0, self.dimension), dtype=np.float32)
+        self._vector_row = np.empty(0, dtype=np.int64)  # Row -> position in the vector column, -1 if none
+        self._clear_pending()
+
+    def _clear_pending(self):
+        self._pending_pdf = []
+        self._pending_chunk = []
+        self._pending_text = []
+        self._pending_vector_row = []
+        self._pending_vectors = []
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, self.columns, name)
+
+    def _manifest_file(self, generation: int) -> str:
+        return os.path.join(self.path, self.MANIFEST_DIR, f"{generation:08d}.json")
+
+    @staticmethod
+    def _map(path: str, dtype, count: int, width: int = 0) -> np.ndarray:
+        """Memory-map the first count items (or rows of width items) of a raw column file"""
+        shape = (count, width) if width else (count,)
+        if count == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+    @property
+    def rows(self) -> int:
+        """Number of rows (live and tombstoned), i.e. the next free id"""
+        return self._base_rows + len(self._pending_pdf)
+
+    @property
+    def vector_rows(self) -> int:
+        """Number of exact vectors stored"""
+        return len(self._vectors) + len(self._pending_vectors)
+
+    def generations(self) -> List[int]:
+        """Published snapshot generations, oldest first"""
+        return sorted(
+            int(name[:-len('.json')])
+            for name in os.listdir(os.path.join(self.path, self.MANIFEST_DIR))
+            if name.endswith('.json') and name[:-len('.json')].isdigit()
+        )
+
+    def exists(self) -> bool:
+        """Whether a manifest has been written to disk"""
+        return bool(self.generations()) or os.path.exists(os.path.join(self.path, self.LEGACY_MANIFEST))
+
+    def manifest_stamp(self) -> Optional[int]:
+        """Latest published generation; changes whenever a new snapshot is published"""
+        generations = self.generations()
+        return generations[-1] if generations else None
+
+    def next_generation(self) -> int:
+        """Generation the next flush publishes; generations only grow, even past ones never loaded here"""
+        return max(self.generation, self.manifest_stamp() or 0) + 1
+
+    def read_manifest(self, generation: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Manifest of a generation (default: the latest), None if nothing was published"""
+        if generation is None:
+            generation = self.manifest_stamp()
+
+        if generation is None:
+            path = os.path.join(self.path, self.LEGACY_MANIFEST)
+            if not os.path.exists(path):
+                return None
+            generation = 0
+        else:
+            path = self._manifest_file(generation)
+
+        with open(path) as f:
+            manifest = json.load(f)
+        manifest['generation'] = generation
+        return manifest
+
+    def load(self, generation: Optional[int] = None):
+        """Map the column files of a generation (default: the latest); cost is independent of corpus size"""
+        self._reset_memory()
+        self._new_columns_on_flush = False
+
+        manifest = self.read_manifest(generation)
+        if manifest is None:
+            self.generation = 0
+            self.columns = ''
+            self._new_columns_on_flush = True
+            return
+
+        self.generation = manifest['generation']
+        self.columns = manifest.get('columns', '')
+        self.pdfs = manifest['pdfs']
+        self.extra = manifest.get('extra', {})
+        self.pdf_ordinals = {pdf_id: ordinal for ordinal, pdf_id in enumerate(self.pdfs) if pdf_id is not None}
+        self._map_columns(manifest['rows'], manifest.get('vector_rows'), manifest.get('vector_start'))
+
+    def _map_columns(self, rows: int, vector_rows: Optional[int], vector_start: Optional[int] = None):
+        """
+        Map the leading rows of the current column set
+        vector_rows is None for older column sets without the row column,
+        which hold a vector for every row from vector_start on
+        """
+        # Columns may hold rows appended after the manifest was written; ignore them
+        self._pdf_col = self._map(self._file(self.PDF_COLUMN), np.int32, rows)
+        self._chunk_col = self._map(self._file(self.CHUNK_COLUMN), np.int32, rows)
+        self._end_col = self._map(self._file(self.OFFSET_COLUMN), np.int64, rows)
+        text_bytes = int(self._end_col[-1]) if rows else 0
+        self._text = self._map(self._file(self.TEXT_BLOB), np.uint8, text_bytes)
+
+        if vector_rows is not None:
+            self._vector_row = self._map(self._file(self.VECTOR_ROW_COLUMN), np.int64, rows)
+        else:
+            # The next flush copies such rows to a set with the row column
+            if vector_start is None:
+                vector_start = rows
+            row_ids = np.arange(rows, dtype=np.int64)
+            self._vector_row = np.where(row_ids >= vector_start, row_ids - vector_start, -1)
+            vector_rows = rows - vector_start
+        self._vectors = self._map(self._file(self.VECTOR_COLUMN), np.float32, vector_rows, self.dimension)
+        self._base_rows = rows
+
+    def append(
+        self,
+        pdf_id: str,
+        ids: List[int],
+        chunks: List[str],
+        chunk_indices: List[int],
+        vectors: Optional[np.ndarray] = None
+    ):
+        """
+        Append rows for a PDF; ids must continue the dense id sequence
+        vectors are the exact vectors to keep for re-scoring, None for
+        partitions that search them exactly anyway (flat)
+        """
+        if ids and ids[0] != self.rows:
+            raise ValueError(f"Metadata rows must be appended in id order (expected {self.rows}, got {ids[0]})")
+
+        ordinal = self.pdf_ordinals.get(pdf_id)
+        if ordinal is None:
+            ordinal = len(self.pdfs)
+            self.pdfs.append(pdf_id)
+            self.pdf_ordinals[pdf_id] = ordinal
+
+        for chunk, chunk_idx in zip(chunks, chunk_indices):
+            self._pending_pdf.append(ordinal)
+            self._pending_chunk.append(chunk_idx)
+            self._pending_text.append(chunk.encode('utf-8'))
+
+        if vectors is None:
+            self._pending_vector_row.extend([-1] * len(chunks))
+        else:
+            start = self.vector_rows
+            self._pending_vector_row.extend(range(start, start + len(vectors)))
+            self._pending_vectors.extend(np.array(vector, dtype=np.float32) for vector in vectors)
+
+    def pad_to(self, rows: int):
+        """Append tombstoned rows so the next id equals rows"""
+        while self.rows < rows:
+            self._pending_pdf.append(-1)
+            self._pending_chunk.append(-1)
+            self._pending_text.append(b'')
+            self._pending_vector_row.append(-1)
+
+    def remove_pdf(self, pdf_id: str):
+        """Tombstone a PDF; its rows stop resolving immediately"""
+        ordinal = self.pdf_ordinals.pop(pdf_id, None)
+        if ordinal is not None:
+            self.pdfs[ordinal] = None
+
+    def pdf_ids(self) -> List[str]:
+        """Live PDF ids"""
+        return list(self.pdf_ordinals.keys())
+
+    def get(self, faiss_id: int) -> Optional[Dict[str, Any]]:
+        """O(1) lookup of a vector's metadata, None if deleted or unknown"""
+        if faiss_id < 0 or faiss_id >= self.rows:
+            return None
+
+        if faiss_id < self._base_rows:
+            ordinal = int(self._pdf_col[faiss_id])
+            chunk_index = int(self._chunk_col[faiss_id])
+            start = int(self._end_col[faiss_id - 1]) if faiss_id > 0 else 0
+            text = self._text[start:int(self._end_col[faiss_id])].tobytes()
+        else:
+            row = faiss_id - self._base_rows
+            ordinal = self._pending_pdf[row]
+            chunk_index = self._pending_chunk[row]
+            text = self._pending_text[row]
+
+        pdf_id = self.pdfs[ordinal] if ordinal >= 0 else None
+        if pdf_id is None:
+            return None
+
+        return {
+            'pdf_id': pdf_id,
+            'chunk_text': text.decode('utf-8'),
+            'chunk_index': chunk_index
+        }
+
+    def get_vectors(self, faiss_ids: np.ndarray):
+        """
+        Exact vectors for a set of ids
+
+        Returns:
+            Tuple of (float32 array [n, dimension], bool mask of ids that have a stored vector)
+        """
+        faiss_ids = np.asarray(faiss_ids, dtype=np.int64)
+        vectors = np.zeros((len(faiss_ids), self.dimension), dtype=np.float32)
+        positions = np.full(len(faiss_ids), -1, dtype=np.int64)
+
+        in_base = (faiss_ids >= 0) & (faiss_ids < self._base_rows)
+        positions[in_base] = self._vector_row[faiss_ids[in_base]]
+        for i in np.flatnonzero((faiss_ids >= self._base_rows) & (faiss_ids < self.rows)):
+            positions[i] = self._pending_vector_row[faiss_ids[i] - self._base_rows]
+
+        valid = positions >= 0
+        stored = valid & (positions < len(self._vectors))
+        vectors[stored] = self._vectors[positions[stored]]
+        for i in np.flatnonzero(valid & ~stored):
+            vectors[i] = self._pending_vectors[positions[i] - len(self._vectors)]
+
+        return vectors, valid
+
+    def reset(self):
+        """Empty the store; the next flush writes a fresh column set"""
+        self._reset_memory()
+        self._new_columns_on_flush = True
+
+    def spill(self):
+        """
+        Write pending rows of a new store to its private building column set
+        and map them, without publishing a generation, so a store filled in
+        blocks (rebuild) keeps one block in memory; the next flush publishes
+        the set
+        """
+        if not self._pending_pdf:
+            return
+
+        if self._new_columns_on_flush:
+            self.columns = f"{self.BUILD_PREFIX}{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            Path(os.path.join(self.path, self.columns)).mkdir(parents=True)
+            self._write_columns('wb', copy_base=True)
+            self._new_columns_on_flush = False
+        elif self.columns.startswith(self.BUILD_PREFIX):
+            self._write_columns('ab')
+        else:
+            raise ValueError("Only a store that has not been published can spill rows")
+
+        rows, vector_rows = self.rows, self.vector_rows
+        self._clear_pending()
+        self._map_columns(rows, vector_rows)
+
+    def discard_unpublished(self):
+        """Delete the building column set of a store that will never be flushed (cancelled rebuild)"""
+        if self.columns.startswith(self.BUILD_PREFIX):
+            shutil.rmtree(os.path.join(self.path, self.columns), ignore_errors=True)
+        self.reset()
+
+    def _builder_running(self, columns: str) -> bool:
+        """Whether the process that spilled a building column set is still alive"""
+        try:
+            os.kill(int(columns[len(self.BUILD_PREFIX):].split('-')[0]), 0)
+        except ProcessLookupError:
+            return False
+        except (PermissionError, ValueError):
+            return True
+        return True
+
+    def _column_sizes(self) -> Dict[str, int]:
+        """Byte size of each column file when it ends at the loaded rows"""
+        return {
+            self.PDF_COLUMN: self._base_rows * 4,
+            self.CHUNK_COLUMN: self._base_rows * 4,
+            self.OFFSET_COLUMN: self._base_rows * 8,
+            self.TEXT_BLOB: int(self._end_col[-1]) if self._base_rows else 0,
+            self.VECTOR_COLUMN: len(self._vectors) * 4 * self.dimension,
+            self.VECTOR_ROW_COLUMN: self._base_rows * 8
+        }
+
+    def _appendable(self) -> bool:
+        """
+        Whether the column files end exactly at the loaded rows
+        Anything past them was written by another process using the same
+        directory, or belongs to a generation that was rolled back, and may
+        be mapped elsewhere; anything missing was pruned by another process
+        """
+        for name, size in self._column_sizes().items():
+            path = self._file(name)
+            if (os.path.getsize(path) if os.path.exists(path) else 0) != size:
+                return False
+        return True
+
+    def _write_columns(self, mode: str, copy_base: bool = False):
+        """Write the pending rows (after the loaded rows when copy_base) to the column files"""
+        base_text = self._column_sizes()[self.TEXT_BLOB]
+        lengths = np.fromiter((len(t) for t in self._pending_text), dtype=np.int64, count=len(self._pending_text))
+        ends = base_text + np.cumsum(lengths)
+
+        for name, base, pending in (
+            (self.PDF_COLUMN, self._pdf_col, [np.asarray(self._pending_pdf, dtype=np.int32)]),
+            (self.CHUNK_COLUMN, self._chunk_col, [np.asarray(self._pending_chunk, dtype=np.int32)]),
+            (self.OFFSET_COLUMN, self._end_col, [ends]),
+            (self.TEXT_BLOB, self._text, self._pending_text),
+            (self.VECTOR_COLUMN, self._vectors, self._pending_vectors),
+            (self.VECTOR_ROW_COLUMN, self._vector_row, [np.asarray(self._pending_vector_row, dtype=np.int64)])
+        ):
+            with open(self._file(name), mode) as f:
+                if copy_base:
+                    # Copied from the mapping, which outlives pruned or replaced files
+                    base.tofile(f)
+                f.writelines(pending)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def flush(self, extra: Optional[Dict[str, Any]] = None):
+        """
+        Append pending rows to the column files, publish a new manifest
+        as the next snapshot generation and map it
+
+        Args:
+            extra: Values to commit atomically with the manifest
+        """
+        self.load(self.publish(extra))
+
+    def publish(self, extra: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Write and fsync pending rows and a new manifest without remapping
+        Rows and mappings already loaded stay valid and readable meanwhile,
+        so callers can do the slow part outside their reader lock and hold
+        it only for load(generation)
+
+        Args:
+            extra: Values to commit atomically with the manifest
+
+        Returns:
+            The published generation
+        """
+        if extra is not None:
+            self.extra = extra
+
+        with self._lock.exclusive():
+            generation = self.next_generation()
+            building = self.columns.startswith(self.BUILD_PREFIX)
+
+            if self._new_columns_on_flush or (self._pending_pdf and not building and not self._appendable()):
+                if not self._new_columns_on_flush:
+                    logger.info(f"Metadata columns {self.columns or '(legacy)'} moved on elsewhere; copying rows to a new column set")
+                self.columns = f"columns-{generation:08d}"
+                Path(os.path.join(self.path, self.columns)).mkdir(parents=True, exist_ok=True)
+                self._write_columns('wb', copy_base=True)
+            elif self._pending_pdf:
+                self._write_columns('ab')
+
+            if building:
+                # Mapped columns stay valid across the rename
+                columns = f"columns-{generation:08d}"
+                os.rename(os.path.join(self.path, self.columns), os.path.join(self.path, columns))
+                self.columns = columns
+
+            # The manifest is the commit point: rows beyond its count are ignored on load
+            manifest_path = self._manifest_file(generation)
+            with open(manifest_path + '.tmp', 'w') as f:
+                json.dump({
+                    'rows': self.rows,
+                    'vector_rows': self.vector_rows,
+                    'columns': self.columns,
+                    'pdfs': self.pdfs,
+                    'extra': self.extra
+                }, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(manifest_path + '.tmp', manifest_path)
+
+            legacy_manifest = os.path.join(self.path, self.LEGACY_MANIFEST)
+            if os.path.exists(legacy_manifest):
+                os.remove(legacy_manifest)
+
+        return generation
+
+    def discard_generations(self, after: int, before: int):
+        """Delete the manifests of generations strictly between after and before (broken snapshots)"""
+        for generation in self.generations():
+            if after < generation < before:
+                os.remove(self._manifest_file(generation))
+
+    def prune(self, retain: int) -> List[Dict[str, Any]]:
+        """
+        Keep the newest retain generations and drop column sets none of them use
+
+        Returns:
+            Manifests of the retained generations, oldest first
+        """
+        # Not while another process is flushing into a column set about to go
+        with self._lock.exclusive():
+            generations = self.generations()
+            for generation in generations[:-retain]:
+                os.remove(self._manifest_file(generation))
+
+            retained = [self.read_manifest(generation) for generation in generations[-retain:]]
+            in_use = {manifest.get('columns', '') for manifest in retained} | {self.columns}
+
+            for name in os.listdir(self.path):
+                if name.startswith('columns-') and name not in in_use:
+                    shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+                elif name.startswith(self.BUILD_PREFIX) and not self._builder_running(name):
+                    # Left behind by a rebuild that crashed
+                    shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+            if '' not in in_use:
+                for name in self._column_sizes():
+                    if os.path.exists(os.path.join(self.path, name)):
+                        os.remove(os.path.join(self.path, name))
+
+        return retained
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Row counts and on-disk size of the columns, with the exact vectors' share"""
+        disk_bytes = sum(
+            os.path.getsize(self._file(name))
+            for name in self._column_sizes()
+            if os.path.exists(self._file(name))
+        )
+        return {
+            'generation': self.generation,
+            'columns': self.columns,
+            'rows': self.rows,
+            'pending_rows': len(self._pending_pdf),
+            'live_pdfs': len(self.pdf_ordinals),
+            'vector_rows': self.vector_rows,
+            'vector_bytes': self.vector_rows * 4 * self.dimension,
+            'disk_bytes': disk_bytes
+        }
@@ -0,0 +1,112 @@
+import json
+import os
+import logging
+from typing import List, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Written next to an exported model by export_onnx_model.py
+ONNX_CONFIG_FILE = 'embedding_config.json'
+
+class TorchEmbeddingModel:
+    """SentenceTransformer (PyTorch) backend"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.name = model_name
+
+    def encode(self, texts: Union[str, List[str]]) -> np.ndarray:
+        return self.model.encode(texts)
+
+class OnnxEmbeddingModel:
+    """
+    ONNX Runtime backend for a SentenceTransformer exported by export_onnx_model.py
+    Runs the transformer on CPU (fp32 or int8-quantized graph) and applies
+    the exported model's mean pooling and normalization in numpy, so its
+    vectors match the PyTorch backend within quantization error
+    """
+
+    def __init__(self, model_path: str, threads: int = 0, batch_size: int = 32):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("EMBEDDING_BACKEND=onnx requires the onnxruntime package")
+        from transformers import AutoTokenizer
+
+        model_dir = os.path.dirname(os.path.abspath(model_path))
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE)) as f:
+            self.config = json.load(f)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.batch_size = batch_size
+
+        # Cache keys must tell quantized vectors apart from full-precision ones
+        quantized = self.config.get('quantized_file') == os.path.basename(model_path)
+        self.name = f"{self.config['model']}:onnx{'-int8' if quantized else ''}"
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.config['max_seq_length'],
+            return_tensors='np'
+        )
+        inputs = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+        hidden = self.session.run(None, inputs)[0]
+
+        # Mean over real (non-padding) tokens
+        mask = tokens['attention_mask'][..., None].astype(np.float32)
+        embeddings = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if self.config.get('normalize', False):
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings.astype(np.float32)
+
+    def encode(self, texts: Union[str, List[str]]) -> np.ndarray:
+        """Embed one text (returns a vector) or a list (returns a matrix)"""
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+
+        embeddings = np.empty((len(texts), self.config['dimension']), dtype=np.float32)
+
+        # Batch texts of similar length together to keep padding low
+        order = sorted(range(len(texts)), key=lambda idx: len(texts[idx]))
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            embeddings[batch] = self._encode_batch([texts[idx] for idx in batch])
+
+        return embeddings[0] if single else embeddings
+
+def load_embedding_model(model_name: str, backend: str, onnx_path: str = None, threads: int = 0):
+    """
+    Embedding model for the configured backend
+    
+    Args:
+        model_name: SentenceTransformer model name (torch backend)
+        backend: 'torch' or 'onnx'
+        onnx_path: Exported .onnx file (onnx backend)
+        threads: ONNX Runtime intra-op threads (0 uses its default)
+    
+    Returns:
+        Model exposing encode(texts) and a name used in cache keys
+    """
+    if backend == 'onnx':
+        if not onnx_path or not os.path.exists(onnx_path):
+            raise FileNotFoundError(f"ONNX embedding model not found: {onnx_path} (run export_onnx_model.py)")
+        return OnnxEmbeddingModel(onnx_path, threads=threads)
+    if backend == 'torch':
+        return TorchEmbeddingModel(model_name)
+    raise ValueError(f"Unknown embedding backend: {backend}")
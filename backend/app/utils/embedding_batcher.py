@@ -0,0 +1,112 @@
+import os
+import queue
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingBatcher:
+    """
+    Dynamic micro-batching of concurrent embedding requests
+    Callers queue a text and block on its result. A background thread takes
+    the first queued text, keeps collecting until window_ms has passed or
+    max_batch texts are waiting, encodes them in one call and hands every
+    caller its row. Queue depth, batch sizes and wait times are tracked.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], window_ms: float, max_batch: int):
+        self.encode = encode
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = {}  # Batch size bucket (1, 2, 4, ...) -> batches
+        self._waits = deque(maxlen=1000)  # Recent seconds from enqueue to result
+        self._requests = 0
+        self._batches = 0
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            # The worker thread does not survive a fork, so each process starts its own
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = None
+                self._pid = os.getpid()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+                self._thread.start()
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embedding of text, computed in a batch with concurrent requests"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future.result()
+
+    def _collect(self) -> list:
+        """Block for one request, then gather more until the window closes or the batch is full"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                embeddings = self.encode([text for text, _, _ in batch])
+            except Exception as e:
+                logger.error(f"Batched embedding of {len(batch)} texts failed: {str(e)}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            done = time.perf_counter()
+            for (_, future, enqueued), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+            with self._stats_lock:
+                bucket = 1 << (len(batch) - 1).bit_length()
+                self._batch_sizes[bucket] = self._batch_sizes.get(bucket, 0) + 1
+                self._waits.extend(done - enqueued for _, _, enqueued in batch)
+                self._requests += len(batch)
+                self._batches += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, batch size histogram and recent wait times (ms)"""
+        with self._stats_lock:
+            waits = sorted(self._waits)
+            return {
+                'queue_depth': self._queue.qsize(),
+                'requests': self._requests,
+                'batches': self._batches,
+                'mean_batch_size': round(self._requests / self._batches, 2) if self._batches else 0.0,
+                'batch_size_histogram': {f"<={size}": count for size, count in sorted(self._batch_sizes.items())},
+                'wait_ms': {
+                    'p50': round(waits[len(waits) // 2] * 1000, 2) if waits else 0.0,
+                    'p95': round(waits[int(len(waits) * 0.95)] * 1000, 2) if waits else 0.0,
+                    'max': round(waits[-1] * 1000, 2) if waits else 0.0
+                },
+                'window_ms': self.window * 1000,
+                'max_batch': self.max_batch
+            }
@@ -0,0 +1,132 @@
+import os
+import sqlite3
+import threading
+import time
+import logging
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Approximate on-disk bytes per row besides the vector (key, timestamps, b-tree)
+ROW_OVERHEAD = 128
+
+class EmbeddingCache:
+    """
+    Persistent (model, chunk hash) -> float32 embedding cache in a local SQLite file
+    Lookups and inserts are batched so a PDF costs one query each way.
+    Rows carry a last-used time; once the cache exceeds max_bytes the least
+    recently used rows are evicted. Safe to share between threads and worker
+    processes (each thread opens its own connection, SQLite serializes writers).
+    """
+
+    def __init__(self, path: str, dimension: int, max_bytes: int):
+        self.path = path
+        self.dimension = dimension
+        self.max_rows = max(1, max_bytes // (dimension * 4 + ROW_OVERHEAD))
+        self._local = threading.local()
+
+        # Counted by this process since it opened the cache
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS embeddings ('
+                'model TEXT NOT NULL, '
+                'chunk_hash TEXT NOT NULL, '
+                'vector BLOB NOT NULL, '
+                'last_used REAL NOT NULL, '
+                'PRIMARY KEY (model, chunk_hash)) WITHOUT ROWID'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)')
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections must not cross threads or forked processes
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_many(self, model: str, chunk_hashes: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Cached embeddings for the given chunk hashes, keyed by hash (misses are absent)"""
+        chunk_hashes = list(dict.fromkeys(chunk_hashes))
+        found = {}
+
+        with self._connection() as conn:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(chunk_hashes), 500):
+                batch = chunk_hashes[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = conn.execute(
+                    f'SELECT chunk_hash, vector FROM embeddings WHERE model = ? AND chunk_hash IN ({placeholders})',
+                    [model, *batch]
+                ).fetchall()
+                for chunk_hash, vector in rows:
+                    found[chunk_hash] = np.frombuffer(vector, dtype='<f4')
+
+            if found:
+                now = time.time()
+                conn.executemany(
+                    'UPDATE embeddings SET last_used = ? WHERE model = ? AND chunk_hash = ?',
+                    [(now, model, chunk_hash) for chunk_hash in found]
+                )
+
+        with self._stats_lock:
+            self.hits += len(found)
+            self.misses += len(chunk_hashes) - len(found)
+        return found
+
+    def put_many(self, model: str, chunk_hashes: List[str], vectors: np.ndarray):
+        """Store embeddings for the given chunk hashes, then evict past the size limit"""
+        vectors = np.asarray(vectors, dtype='<f4')
+        now = time.time()
+
+        with self._connection() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (model, chunk_hash, vector, last_used) VALUES (?, ?, ?, ?)',
+                [(model, chunk_hash, vector.tobytes(), now) for chunk_hash, vector in zip(chunk_hashes, vectors)]
+            )
+
+            excess = conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0] - self.max_rows
+            if excess > 0:
+                conn.execute(
+                    'DELETE FROM embeddings WHERE (model, chunk_hash) IN '
+                    '(SELECT model, chunk_hash FROM embeddings ORDER BY last_used LIMIT ?)',
+                    (excess,)
+                )
+                with self._stats_lock:
+                    self.evictions += excess
+
+    def stats(self) -> Dict[str, int]:
+        """Rows held, the row limit, file size, and this process's hits, misses and evictions"""
+        with self._connection() as conn:
+            rows = conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+        disk_bytes = sum(
+            os.path.getsize(self.path + suffix)
+            for suffix in ('', '-wal')
+            if os.path.exists(self.path + suffix)
+        )
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': rows,
+                'max_entries': self.max_rows,
+                'disk_bytes': disk_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,167 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Model loaded once per pool process by _init_worker
+_worker_model = None
+
+def _init_worker(model_name: str, backend: str, onnx_path: str, threads: int):
+    """Pool process initializer: cap the math libraries' threads, then load the model"""
+    global _worker_model
+
+    # Read by OpenMP/MKL when torch or onnxruntime first loads them
+    for variable in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[variable] = str(threads)
+
+    if backend == 'torch':
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+
+    from app.utils.embedding_backends import load_embedding_model
+    _worker_model = load_embedding_model(model_name, backend, onnx_path, threads)
+
+def _encode(texts: List[str]) -> tuple:
+    """Encode one task in a pool process; returns (embeddings, started, seconds)"""
+    started = time.time()
+    embeddings = np.asarray(_worker_model.encode(texts), dtype=np.float32)
+    return embeddings, started, time.time() - started
+
+class EmbeddingPool:
+    """
+    Bounded process pool for ingestion embeddings
+    Uploaded PDFs are embedded in `workers` separate processes, each limited
+    to `threads` math threads, so a large upload cannot take over the CPU
+    the web process needs for query embeddings. Texts are split into tasks
+    of task_size, which lets concurrent uploads share the pool. Processes are
+    spawned, not forked, so they inherit neither the web process's thread
+    pools nor its MongoDB client, and each web process owns its own pool.
+    """
+
+    def __init__(self, workers: int, threads: int, model_name: str, backend: str,
+                 onnx_path: str = None, task_size: int = 256, dimension: int = 384):
+        self.workers = max(1, workers)
+        self.threads = max(1, threads)
+        self.initargs = (model_name, backend, onnx_path, self.threads)
+        self.task_size = max(1, task_size)
+        self.dimension = dimension
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+        self._started = time.time()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._texts = 0
+        self._busy = 0.0  # Process-seconds spent encoding
+        self._waits = deque(maxlen=1000)  # Recent seconds tasks queued before a process took them
+        self._runs = deque(maxlen=1000)  # Recent seconds spent encoding a task
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            # A forked web worker cannot use its parent's pool processes
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=self.initargs
+                )
+                self._pid = os.getpid()
+                self._pending = 0
+            return self._executor
+
+    def _reset(self, executor: ProcessPoolExecutor):
+        """Drop a broken executor; the next call starts fresh processes"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _finished(self, future, submitted: float, count: int):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self._failed += 1
+                return
+            _, started, seconds = future.result()
+            self._completed += 1
+            self._texts += count
+            self._busy += seconds
+            self._waits.append(max(0.0, started - submitted))
+            self._runs.append(seconds)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embeddings of texts in order, computed by the pool processes"""
+        if not len(texts):
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        executor = self._get_executor()
+        futures = []
+        try:
+            for start in range(0, len(texts), self.task_size):
+                batch = list(texts[start:start + self.task_size])
+                submitted = time.time()
+                future = executor.submit(_encode, batch)
+                with self._lock:
+                    self._pending += 1
+                future.add_done_callback(
+                    lambda done, submitted=submitted, count=len(batch): self._finished(done, submitted, count)
+                )
+                futures.append(future)
+
+            return np.vstack([future.result()[0] for future in futures])
+        except BrokenProcessPool:
+            logger.error("Embedding pool process died; restarting the pool")
+            self._reset(executor)
+            raise
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool size, running and queued tasks, utilisation and recent queue/encode times (ms)"""
+        with self._lock:
+            waits = sorted(self._waits)
+            runs = sorted(self._runs)
+            running = min(self._pending, self.workers)
+            uptime = max(time.time() - self._started, 1e-9)
+
+            def percentiles(values):
+                return {
+                    'p50': round(values[len(values) // 2] * 1000, 2) if values else 0.0,
+                    'p95': round(values[int(len(values) * 0.95)] * 1000, 2) if values else 0.0,
+                    'max': round(values[-1] * 1000, 2) if values else 0.0
+                }
+
+            return {
+                'workers': self.workers,
+                'threads_per_worker': self.threads,
+                'running_tasks': running,
+                'queued_tasks': self._pending - running,
+                'completed_tasks': self._completed,
+                'failed_tasks': self._failed,
+                'texts_embedded': self._texts,
+                'utilization': round(self._busy / (self.workers * uptime), 4),
+                'queue_wait_ms': percentiles(waits),
+                'encode_ms': percentiles(runs),
+                'task_size': self.task_size
+            }
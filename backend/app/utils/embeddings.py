@@ -1,5 +1,11 @@
-from sentence_transformers import SentenceTransformer
 from flask import current_app
+from app.config import Config
+from app.utils.embedding_backends import load_embedding_model
+from app.utils.embedding_batcher import EmbeddingBatcher
+from app.utils.embedding_cache import EmbeddingCache
+from app.utils.embedding_pool import EmbeddingPool
+from app.utils.lru_cache import LRUCache
+from app.utils.pdf_processor import PDFProcessor
 import numpy as np
 import logging
 
@@ -9,36 +15,158 @@ class EmbeddingGenerator:
     """Embedding generation utility"""
     
     _model = None
+    _model_name = None
+    
+    # Query embeddings keyed by (model, normalized text); repeated questions skip the model
+    query_cache = LRUCache(Config.QUERY_EMBEDDING_CACHE_SIZE, ttl=Config.QUERY_EMBEDDING_CACHE_TTL)
+    
+    # Chunk embeddings on disk keyed by (model, chunk hash); opened on first use
+    _chunk_cache = None
+    
+    # Groups concurrent query encodes into one model call; created on first use
+    _query_batcher = None
+    
+    # Separate processes that embed uploaded PDFs; created on first use
+    _ingest_pool = None
     
     @classmethod
     def initialize(cls):
-        """Initialize embedding model"""
+        """Initialize embedding model on the configured backend (torch or onnx)"""
         if not cls._model:
             try:
-                model_name = current_app.config['EMBEDDING_MODEL']
-                cls._model = SentenceTransformer(model_name)
-                logger.info(f"Embedding model initialized: {model_name}")
+                cls._model = load_embedding_model(
+                    current_app.config['EMBEDDING_MODEL'],
+                    current_app.config['EMBEDDING_BACKEND'],
+                    current_app.config['EMBEDDING_ONNX_PATH'],
+                    current_app.config['EMBEDDING_ONNX_THREADS']
+                )
+                # Includes the backend, so cached vectors never mix backends
+                cls._model_name = cls._model.name
+                logger.info(f"Embedding model initialized: {cls._model_name}")
             except Exception as e:
                 logger.error(f"Failed to initialize embedding model: {str(e)}")
                 raise
     
+    @classmethod
+    def model_name(cls):
+        """Name of the loaded model including its backend; identifies its vector space"""
+        cls.initialize()
+        return cls._model_name
+    
     @staticmethod
     def generate_embedding(text):
-        """Generate embedding for text"""
+        """Generate embedding for text, reusing the cached one for a repeated query"""
         try:
             EmbeddingGenerator.initialize()
-            embedding = EmbeddingGenerator._model.encode(text)
-            return embedding
+            key = (EmbeddingGenerator._model_name, ' '.join(text.split()))
+            
+            embedding = EmbeddingGenerator.query_cache.get(key)
+            if embedding is None:
+                batcher = EmbeddingGenerator.query_batcher()
+                embedding = batcher.embed(text) if batcher else EmbeddingGenerator._model.encode(text)
+                EmbeddingGenerator.query_cache.put(key, embedding)
+            
+            # Callers get their own copy so the cached vector cannot be modified
+            return embedding.copy()
         except Exception as e:
             logger.error(f"Failed to generate embedding: {str(e)}")
             raise
     
+    @staticmethod
+    def cache_stats():
+        """Hit rate and size of the query embedding cache"""
+        return EmbeddingGenerator.query_cache.stats()
+    
+    @classmethod
+    def query_batcher(cls):
+        """Micro-batcher for query embeddings, or None when QUERY_BATCH_WINDOW_MS is 0"""
+        if cls._query_batcher is None and Config.QUERY_BATCH_WINDOW_MS > 0:
+            cls._query_batcher = EmbeddingBatcher(
+                lambda texts: cls._model.encode(texts),
+                Config.QUERY_BATCH_WINDOW_MS,
+                Config.QUERY_BATCH_MAX_SIZE
+            )
+        return cls._query_batcher
+    
+    @classmethod
+    def batcher_stats(cls):
+        """Queue depth, batch sizes and wait times of the query micro-batcher"""
+        return cls._query_batcher.stats() if cls._query_batcher else None
+    
+    @classmethod
+    def chunk_cache(cls):
+        """Persistent chunk embedding cache, or None when disabled"""
+        if cls._chunk_cache is None and Config.EMBEDDING_CACHE_MAX_MB > 0:
+            cls._chunk_cache = EmbeddingCache(
+                Config.EMBEDDING_CACHE_PATH,
+                Config.VECTOR_DIMENSION,
+                Config.EMBEDDING_CACHE_MAX_MB * 1024 * 1024
+            )
+        return cls._chunk_cache
+    
+    @classmethod
+    def chunk_cache_stats(cls):
+        """Size, hit rate and evictions of the chunk embedding cache, None when disabled"""
+        cache = cls.chunk_cache()
+        return cache.stats() if cache else None
+    
+    @classmethod
+    def ingest_pool(cls):
+        """Process pool for ingestion embeddings, or None when INGEST_EMBEDDING_WORKERS is 0"""
+        if cls._ingest_pool is None and Config.INGEST_EMBEDDING_WORKERS > 0:
+            cls._ingest_pool = EmbeddingPool(
+                Config.INGEST_EMBEDDING_WORKERS,
+                Config.INGEST_EMBEDDING_THREADS,
+                Config.EMBEDDING_MODEL,
+                Config.EMBEDDING_BACKEND,
+                Config.EMBEDDING_ONNX_PATH,
+                Config.INGEST_EMBEDDING_TASK_SIZE,
+                Config.VECTOR_DIMENSION
+            )
+        return cls._ingest_pool
+    
+    @classmethod
+    def pool_stats(cls):
+        """Running and queued tasks and utilisation of the ingestion pool"""
+        return cls._ingest_pool.stats() if cls._ingest_pool else None
+    
     @staticmethod
     def generate_embeddings_batch(texts):
-        """Generate embeddings for multiple texts"""
+        """
+        Generate embeddings for multiple texts (PDF ingestion)
+        Embeddings of texts seen before are read from the on-disk chunk
+        cache in one lookup; only the rest are encoded, in the ingestion
+        pool when one is configured so the request's process stays free
+        for query embeddings. upload_pdf first reuses the model's vectors
+        already stored in MongoDB, which take precedence; this cache only
+        sees the chunks MongoDB has no vector for (e.g. of deleted PDFs)
+        """
         try:
             EmbeddingGenerator.initialize()
-            embeddings = EmbeddingGenerator._model.encode(texts)
+            pool = EmbeddingGenerator.ingest_pool()
+            encode = pool.encode if pool else EmbeddingGenerator._model.encode
+            
+            cache = EmbeddingGenerator.chunk_cache()
+            if cache is None or not len(texts):
+                return encode(texts)
+            
+            model_name = EmbeddingGenerator._model_name
+            chunk_hashes = [PDFProcessor.chunk_hash(text) for text in texts]
+            cached = cache.get_many(model_name, chunk_hashes)
+            
+            missing = [idx for idx, chunk_hash in enumerate(chunk_hashes) if chunk_hash not in cached]
+            embeddings = np.empty((len(texts), Config.VECTOR_DIMENSION), dtype=np.float32)
+            
+            if missing:
+                computed = encode([texts[idx] for idx in missing])
+                embeddings[missing] = computed
+                cache.put_many(model_name, [chunk_hashes[idx] for idx in missing], computed)
+            
+            for idx, chunk_hash in enumerate(chunk_hashes):
+                if chunk_hash in cached:
+                    embeddings[idx] = cached[chunk_hash]
+            
+            logger.info(f"Embedded {len(missing)} of {len(texts)} texts ({len(texts) - len(missing)} from cache)")
             return embeddings
         except Exception as e:
             logger.error(f"Failed to generate batch embeddings: {str(e)}")
@@ -0,0 +1,458 @@
+import heapq
+import ipaddress
+import logging
+import queue
+import socket
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Store methods a shard process answers over its connection
+SHARD_METHODS = {
+    'add_vectors',
+    'remove_pdf_vectors',
+    'search_batch',
+    'search_multiple_pdfs',
+    'save_index',
+    'get_stats',
+    'rebuild_from_mongodb',
+    'rebuild_status',
+    'cancel_rebuild',
+    'sync_from_mongodb',
+    'compact',
+    'rollback'
+}
+
+# Shipped as the example key in older configs; anyone could present it
+WELL_KNOWN_AUTHKEYS = {b'faiss-shard-key-change-in-production'}
+
+# Shards reachable from other hosts need a key that cannot be guessed
+MIN_REMOTE_AUTHKEY_LENGTH = 32
+
+def shard_for(pdf_id: str, shard_count: int) -> int:
+    """Shard that owns a PDF; crc32 keeps the mapping stable across processes"""
+    return zlib.crc32(str(pdf_id).encode('utf-8')) % shard_count
+
+def parse_address(address: str):
+    """'host:port' becomes a TCP address, anything else is a Unix socket path"""
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return (host or '127.0.0.1', int(port))
+    return address
+
+def _is_loopback(host: str) -> bool:
+    try:
+        return all(
+            ipaddress.ip_address(info[4][0]).is_loopback
+            for info in socket.getaddrinfo(host, None)
+        )
+    except (socket.gaierror, ValueError):
+        return False
+
+def check_authkey(authkey: bytes, address: Optional[str] = None):
+    """
+    Refuse shard keys that would let anyone in
+    Shard connections exchange pickles, so whoever holds the key can run
+    code in the shard (and in its clients); the key is all that guards them
+
+    Args:
+        authkey: Shared secret (FAISS_SHARD_AUTHKEY)
+        address: Listening address; TCP on a non-loopback host needs a
+                 key of at least MIN_REMOTE_AUTHKEY_LENGTH bytes
+
+    Raises:
+        ValueError: If the key is empty, well known or too short for the address
+    """
+    if not authkey:
+        raise ValueError("FAISS_SHARD_AUTHKEY must be set to use FAISS shards")
+    if authkey in WELL_KNOWN_AUTHKEYS:
+        raise ValueError("FAISS_SHARD_AUTHKEY is the example key; set a secret one")
+
+    parsed = parse_address(address) if address else None
+    if isinstance(parsed, tuple) and not _is_loopback(parsed[0]) and len(authkey) < MIN_REMOTE_AUTHKEY_LENGTH:
+        raise ValueError(
+            f"Listening on non-loopback address {address} needs a FAISS_SHARD_AUTHKEY "
+            f"of at least {MIN_REMOTE_AUTHKEY_LENGTH} characters"
+        )
+
+def serve_shard(store, address: str, authkey: bytes):
+    """
+    Answer store calls from ShardedVectorStore clients until the process exits
+    Each connection is served by its own thread; the store's own locking
+    lets searches from several connections run concurrently
+
+    Args:
+        store: The local FAISSVectorStore holding this shard's PDFs
+        address: 'host:port' or Unix socket path to listen on
+        authkey: Shared secret clients must present
+
+    Raises:
+        ValueError: If check_authkey rejects the key for this address
+    """
+    check_authkey(authkey, address)
+    listener = Listener(parse_address(address), authkey=authkey)
+    logger.info(f"FAISS shard serving {store.total_vectors} vectors on {address}")
+
+    while True:
+        try:
+            conn = listener.accept()
+        except Exception as e:
+            logger.warning(f"Rejected shard connection: {str(e)}")
+            continue
+        threading.Thread(target=_handle_connection, args=(store, conn), daemon=True).start()
+
+def _handle_connection(store, conn):
+    """Serve (method, args, kwargs) requests on one connection"""
+    with conn:
+        while True:
+            try:
+                method, args, kwargs = conn.recv()
+            except (EOFError, OSError):
+                return
+
+            try:
+                if method not in SHARD_METHODS:
+                    raise ValueError(f"Unknown shard method: {method}")
+                conn.send(('ok', getattr(store, method)(*args, **kwargs)))
+            except Exception as e:
+                logger.error(f"Shard call {method} failed: {str(e)}")
+                conn.send(('error', str(e)))
+
+class ShardClient:
+    """
+    Connection pool to one shard process
+    Concurrent callers each borrow their own connection, so requests
+    from several Flask threads reach the shard in parallel
+    """
+
+    def __init__(self, address: str, authkey: bytes):
+        self.address = address
+        self.authkey = authkey
+        self._idle = queue.LifoQueue()
+
+    @contextmanager
+    def _connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = Client(parse_address(self.address), authkey=self.authkey)
+
+        try:
+            yield conn
+        except Exception:
+            # A failed exchange may leave the connection out of step; drop it
+            conn.close()
+            raise
+        else:
+            self._idle.put(conn)
+
+    def call(self, method: str, *args, **kwargs):
+        """Run a store method on the shard and return its result"""
+        with self._connection() as conn:
+            conn.send((method, args, kwargs))
+            status, result = conn.recv()
+
+        if status != 'ok':
+            raise RuntimeError(f"Shard {self.address} failed {method}: {result}")
+        return result
+
+class ShardedVectorStore:
+    """
+    Scatter-gather client over K FAISS shard processes
+    PDFs are hashed to shards by pdf_id, so writes and single-PDF searches
+    touch one shard while unfiltered searches fan out to all of them in
+    parallel and merge their top-k. Exposes the FAISSVectorStore API;
+    faiss_id values in results are only unique within their shard.
+    """
+
+    def __init__(self, addresses: List[str], authkey: bytes):
+        if not addresses:
+            raise ValueError("ShardedVectorStore needs at least one shard address")
+        check_authkey(authkey)
+
+        self.shards = [ShardClient(address, authkey) for address in addresses]
+        self._pool = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix='faiss-shard')
+
+        logger.info(f"Sharded FAISS store over {len(self.shards)} shards")
+
+    @property
+    def total_vectors(self) -> int:
+        """Total number of vectors across all shards"""
+        return self.get_stats()['total_vectors']
+
+    def _shard(self, pdf_id: str) -> ShardClient:
+        return self.shards[shard_for(pdf_id, len(self.shards))]
+
+    def _scatter(self, calls: Dict[int, tuple]) -> Dict[int, Any]:
+        """
+        Run one call per shard in parallel
+
+        Args:
+            calls: Maps shard number to (method, args, kwargs)
+
+        Returns:
+            Maps shard number to the call's result
+        """
+        futures = {
+            shard: self._pool.submit(self.shards[shard].call, method, *args, **kwargs)
+            for shard, (method, args, kwargs) in calls.items()
+        }
+        return {shard: future.result() for shard, future in futures.items()}
+
+    def add_vectors(
+        self,
+        pdf_id: str,
+        embeddings: np.ndarray,
+        chunks: List[str],
+        chunk_indices: List[int]
+    ) -> bool:
+        """Add a PDF's vectors to the shard that owns it"""
+        try:
+            return self._shard(pdf_id).call(
+                'add_vectors',
+                pdf_id,
+                np.asarray(embeddings, dtype='float32'),
+                list(chunks),
+                list(chunk_indices)
+            )
+        except Exception as e:
+            logger.error(f"Error adding vectors to FAISS shard: {str(e)}")
+            return False
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        pdf_id: Optional[str] = None,
+        top_k: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Search one PDF on its shard, or every shard when unfiltered"""
+        results = self.search_batch(query_embedding, [pdf_id], top_k)
+        return results[0] if results else []
+
+    def search_batch(
+        self,
+        queries: np.ndarray,
+        filters: Optional[List[Any]] = None,
+        top_k: int = 5
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search many query vectors at once
+        Each shard receives only the queries that can match its PDFs,
+        with their filters narrowed to the PDFs it owns
+
+        Args:
+            queries: Query matrix (shape: [n, 384])
+            filters: Optional per-query filter: None (all PDFs), a PDF ID,
+                     or a list of PDF IDs
+            top_k: Number of results to return per query
+
+        Returns:
+            One list of similarity results per query (empty list on error)
+        """
+        try:
+            queries = np.asarray(queries, dtype='float32')
+            queries = queries.reshape(-1, queries.shape[-1])
+
+            num_queries = len(queries)
+            if filters is None:
+                filters = [None] * num_queries
+            if len(filters) != num_queries:
+                raise ValueError(f"Expected {num_queries} filters, got {len(filters)}")
+
+            rows_by_shard = {}
+            for row, pdf_filter in enumerate(filters):
+                if not pdf_filter:
+                    for shard in range(len(self.shards)):
+                        rows_by_shard.setdefault(shard, ([], []))
+                        rows_by_shard[shard][0].append(row)
+                        rows_by_shard[shard][1].append(None)
+                    continue
+
+                pdf_ids = [pdf_filter] if isinstance(pdf_filter, str) else pdf_filter
+                owned = {}
+                for pdf_id in pdf_ids:
+                    owned.setdefault(shard_for(pdf_id, len(self.shards)), []).append(pdf_id)
+                for shard, shard_pdf_ids in owned.items():
+                    rows_by_shard.setdefault(shard, ([], []))
+                    rows_by_shard[shard][0].append(row)
+                    rows_by_shard[shard][1].append(shard_pdf_ids)
+
+            results_by_shard = self._scatter({
+                shard: ('search_batch', (queries[rows], shard_filters, top_k), {})
+                for shard, (rows, shard_filters) in rows_by_shard.items()
+            })
+
+            candidates = [[] for _ in range(num_queries)]
+            for shard, shard_results in results_by_shard.items():
+                for row, results in zip(rows_by_shard[shard][0], shard_results):
+                    candidates[row].extend(results)
+
+            return [
+                heapq.nlargest(top_k, row_candidates, key=lambda x: x['similarity'])
+                for row_candidates in candidates
+            ]
+
+        except Exception as e:
+            logger.error(f"Error searching FAISS shards: {str(e)}")
+            return []
+
+    def search_multiple_pdfs(
+        self,
+        query_embedding: np.ndarray,
+        pdf_ids: List[str],
+        top_k_per_pdf: int = 3
+    ) -> List[Dict[str, Any]]:
+        """Search each PDF on its shard in parallel and rank the union by similarity"""
+        try:
+            pdf_ids_by_shard = {}
+            for pdf_id in dict.fromkeys(pdf_ids):
+                pdf_ids_by_shard.setdefault(shard_for(pdf_id, len(self.shards)), []).append(pdf_id)
+
+            results_by_shard = self._scatter({
+                shard: ('search_multiple_pdfs', (query_embedding, shard_pdf_ids, top_k_per_pdf), {})
+                for shard, shard_pdf_ids in pdf_ids_by_shard.items()
+            })
+
+            all_results = [result for results in results_by_shard.values() for result in results]
+            all_results.sort(key=lambda x: x['similarity'], reverse=True)
+
+            logger.info(f"✅ Found {len(all_results)} results across {len(pdf_ids)} PDFs on {len(pdf_ids_by_shard)} shards")
+            return all_results
+
+        except Exception as e:
+            logger.error(f"❌ Error searching multiple PDFs on shards: {str(e)}")
+            return []
+
+    def remove_pdf_vectors(self, pdf_id: str) -> bool:
+        """Remove a PDF's vectors from the shard that owns it"""
+        try:
+            return self._shard(pdf_id).call('remove_pdf_vectors', pdf_id)
+        except Exception as e:
+            logger.error(f"Error removing PDF vectors from FAISS shard: {str(e)}")
+            return False
+
+    def save_index(self):
+        """Checkpoint every shard"""
+        try:
+            self._scatter({shard: ('save_index', (), {}) for shard in range(len(self.shards))})
+        except Exception as e:
+            logger.error(f"Error saving FAISS shards: {str(e)}")
+
+    def sync_from_mongodb(self) -> bool:
+        """Incrementally sync every shard in parallel with the PDFs hashed to it"""
+        try:
+            results = self._scatter({
+                shard: ('sync_from_mongodb', (), {'shard': (shard, len(self.shards))})
+                for shard in range(len(self.shards))
+            })
+            return all(results.values())
+        except Exception as e:
+            logger.error(f"Error syncing FAISS shards: {str(e)}")
+            return False
+
+    def compact(self, background: bool = True) -> bool:
+        """Compact every shard; each drops its own tombstones and re-trains its partitions"""
+        try:
+            results = self._scatter({
+                shard: ('compact', (), {'background': background})
+                for shard in range(len(self.shards))
+            })
+            return all(results.values())
+        except Exception as e:
+            logger.error(f"Error compacting FAISS shards: {str(e)}")
+            return False
+
+    def rollback(self, generation: int, shard: Optional[int] = None) -> bool:
+        """
+        Restore snapshot generation on every shard, or on one shard
+        Shards number their generations independently; the rollback only
+        starts once every targeted shard has confirmed it retains generation
+
+        Args:
+            generation: Snapshot generation to restore
+            shard: Optional shard number to roll back on its own
+        """
+        try:
+            targets = range(len(self.shards)) if shard is None else [shard]
+            stats = self._scatter({target: ('get_stats', (), {}) for target in targets})
+
+            missing = [target for target in targets if generation not in stats[target]['snapshots']['retained']]
+            if missing:
+                logger.warning(f"FAISS snapshot generation {generation} is not retained on shards {missing}")
+                return False
+
+            results = self._scatter({target: ('rollback', (generation,), {}) for target in targets})
+            return all(results.values())
+        except Exception as e:
+            logger.error(f"Error rolling back FAISS shards: {str(e)}")
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Totals across shards plus each shard's own statistics"""
+        shard_stats = self._scatter({shard: ('get_stats', (), {}) for shard in range(len(self.shards))})
+        shard_stats = [shard_stats[shard] for shard in range(len(self.shards))]
+
+        return {
+            'total_vectors': sum(stats['total_vectors'] for stats in shard_stats),
+            'total_pdfs': sum(stats['total_pdfs'] for stats in shard_stats),
+            'total_partitions': sum(stats['total_partitions'] for stats in shard_stats),
+            'dimension': shard_stats[0]['dimension'],
+            'index_type': f"sharded:{len(self.shards)}",
+            'shard_count': len(self.shards),
+            'shards': [
+                dict(stats, address=client.address)
+                for client, stats in zip(self.shards, shard_stats)
+            ]
+        }
+
+    def rebuild_from_mongodb(self, background: bool = False) -> bool:
+        """
+        Rebuild every shard in parallel from MongoDB
+        Each shard loads only the PDFs hashed to it, so this also reshards
+        the corpus after the shard count changes
+        """
+        try:
+            results = self._scatter({
+                shard: ('rebuild_from_mongodb', (), {'shard': (shard, len(self.shards)), 'background': background})
+                for shard in range(len(self.shards))
+            })
+            return all(results.values())
+        except Exception as e:
+            logger.error(f"Error rebuilding FAISS shards: {str(e)}")
+            return False
+
+    def rebuild_status(self) -> Dict[str, Any]:
+        """Combined rebuild progress; the slowest shard sets the ETA"""
+        shard_status = self._scatter({shard: ('rebuild_status', (), {}) for shard in range(len(self.shards))})
+        shard_status = [shard_status[shard] for shard in range(len(self.shards))]
+
+        states = {status['state'] for status in shard_status}
+        state = next(
+            (state for state in ('running', 'failed', 'cancelled', 'completed') if state in states),
+            'idle'
+        )
+        total_vectors = sum(status.get('total_vectors', 0) for status in shard_status)
+        processed_vectors = sum(status.get('processed_vectors', 0) for status in shard_status)
+        etas = [status['eta_seconds'] for status in shard_status if status.get('eta_seconds') is not None]
+
+        return {
+            'state': state,
+            'total_vectors': total_vectors,
+            'processed_vectors': processed_vectors,
+            'percent': round(100.0 * processed_vectors / total_vectors, 1) if total_vectors else 0.0,
+            'vectors_per_sec': round(sum(status.get('vectors_per_sec', 0) for status in shard_status), 1),
+            'eta_seconds': max(etas) if etas else None,
+            'shards': shard_status
+        }
+
+    def cancel_rebuild(self) -> bool:
+        """Cancel the rebuild on every shard still running one"""
+        results = self._scatter({shard: ('cancel_rebuild', (), {}) for shard in range(len(self.shards))})
+        return any(results.values())
@@ -1,17 +1,39 @@
 import faiss
+import heapq
 import numpy as np
 import pickle
 import os
 from pathlib import Path
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import threading
+import time
+from contextlib import contextmanager
+from app.config import Config
+from app.utils.chunk_metadata import ChunkMetadataStore
+from app.utils.faiss_wal import WriteAheadLog
+from app.utils.file_lock import FileLock
+from app.utils.rwlock import ReadWriteLock
 
 logger = logging.getLogger(__name__)
 
+# 8-bit PQ trains 256 centroids per sub-quantizer; FAISS wants ~39 points each
+PQ_MIN_TRAIN_SIZE = 256 * 39
+
 class FAISSVectorStore:
     """
     FAISS-based vector store for efficient similarity search
+    Vectors are partitioned into one sub-index per PDF, so filtered
+    searches only scan the vectors of the requested PDF
+    Mutations are journaled to a write-ahead log and folded into a
+    checkpoint every FAISS_CHECKPOINT_INTERVAL records. Each checkpoint is
+    an immutable snapshot generation published by its metadata manifest;
+    the last FAISS_SNAPSHOT_RETAIN generations are kept for rollback
+    Searches share a read lock; writers are serialized, build partitions
+    outside the lock and only hold it exclusively to swap them in
+    In shared mode (FAISS_SHARED) every worker process maps the same
+    checkpoint: writers checkpoint under an inter-process lock and the
+    others re-map it within FAISS_SYNC_INTERVAL seconds
     Singleton pattern to ensure single instance across application
     """
     _instance = None
@@ -26,58 +48,515 @@ class FAISSVectorStore:
         return cls._instance
     
     def __init__(self):
-        """Initialize FAISS index and load existing data"""
+        """Initialize FAISS partitions and load existing data"""
         if self._initialized:
             return
         
         self.dimension = 384  # all-MiniLM-L6-v2 embedding dimension
-        self.index = None
-        self.id_map = {}  # Maps FAISS index position to metadata
-        self.pdf_vector_map = {}  # Maps pdf_id to list of FAISS indices
-        self.index_path = 'faiss_data'
+        self.partitions = {}  # Maps pdf_id to its own FAISS sub-index
+        self._dirty_partitions = set()  # Partitions not yet written to disk
+        self.index_path = Config.FAISS_INDEX_PATH
+        self.partition_path = os.path.join(self.index_path, 'partitions')
+        # Maps global FAISS id (row) to pdf_id, chunk_text and chunk_index
+        self.metadata = ChunkMetadataStore(os.path.join(self.index_path, 'metadata'), self.dimension)
+        self.checkpoint_interval = Config.FAISS_CHECKPOINT_INTERVAL
+        self.index_mode = Config.FAISS_INDEX_TYPE  # flat, ivf or hnsw
+        self.index_params = {
+            'min_train_size': Config.FAISS_MIN_TRAIN_SIZE,
+            'nlist': Config.FAISS_IVF_NLIST,
+            'nprobe': Config.FAISS_IVF_NPROBE,
+            'hnsw_m': Config.FAISS_HNSW_M,
+            'ef_construction': Config.FAISS_HNSW_EF_CONSTRUCTION,
+            'ef_search': Config.FAISS_HNSW_EF_SEARCH
+        }
+        self.quantization = Config.FAISS_QUANTIZATION  # none, sq8, fp16 or pq
+        self.pq_m = Config.FAISS_PQ_M
+        self.rerank_factor = Config.FAISS_RERANK_FACTOR  # 0 disables exact re-scoring
+        self.mmap_enabled = Config.FAISS_MMAP  # Map partition files instead of reading them into memory
+        self.rebuild_block = max(1, Config.FAISS_REBUILD_BLOCK)  # Vectors read from MongoDB per block during rebuilds
+        self._wal_seq = 0  # Sequence number of the last journaled record
+        self._records_since_checkpoint = 0
+        self._rw_lock = ReadWriteLock()  # Guards partitions and metadata for readers
+        self._write_mutex = threading.RLock()  # Serializes writers (journal, ids, checkpoints)
+        self.shared = Config.FAISS_SHARED  # Share one on-disk checkpoint between worker processes
+        self.sync_interval = Config.FAISS_SYNC_INTERVAL  # Seconds between checks for newer checkpoints
+        self.snapshot_retain = max(1, Config.FAISS_SNAPSHOT_RETAIN)  # Snapshot generations kept for rollback
+        self.compact_ratio = Config.FAISS_COMPACT_RATIO  # Tombstoned row share that triggers compaction; 0 disables
+        self._partition_names = {}  # Maps pdf_id to its partition file in the loaded snapshot
+        self._mongo_watermark = None  # Newest MongoDB vectorstore _id reflected by the last sync
+        self._compaction_thread = None
+        self._rebuild_lock = threading.Lock()  # Held for the whole of a rebuild
+        self._rebuild_cancel = threading.Event()
+        self._rebuild_progress = {'state': 'idle'}
+        self._last_sync = 0.0
+        self._exclusive_depth = 0
         
-        # Create directory if it doesn't exist
-        Path(self.index_path).mkdir(exist_ok=True)
+        # Create directories if they don't exist
+        Path(self.partition_path).mkdir(parents=True, exist_ok=True)
+        self._file_lock = FileLock(os.path.join(self.index_path, 'store.lock'))
         
-        # Initialize or load index
-        self.initialize_index()
+        # Load the last checkpoint, then replay the log tail on top of it
+        self.wal = WriteAheadLog(os.path.join(self.index_path, 'wal.log'))
+        if self.shared:
+            # Workers starting together load one consistent checkpoint, and the
+            # first of them folds a log tail left by a crashed writer into it
+            with self._file_lock.exclusive():
+                self.initialize_index()
+                self._replay_wal()
+                if self._records_since_checkpoint:
+                    self.save_index()
+        else:
+            self.initialize_index()
+            self._replay_wal()
         self._initialized = True
         
-        logger.info(f"FAISS Vector Store initialized with {self.index.ntotal} vectors")
+        logger.info(f"FAISS Vector Store initialized with {self.total_vectors} vectors in {len(self.partitions)} partitions")
+    
+    @property
+    def total_vectors(self) -> int:
+        """Total number of vectors across all partitions"""
+        return sum(partition.ntotal for partition in self.partitions.values())
+    
+    def _partition_file(self, pdf_id: str) -> str:
+        """Path of a PDF partition in the unversioned layout of older stores"""
+        return os.path.join(self.partition_path, f"{pdf_id}.faiss")
+    
+    @staticmethod
+    def _snapshot_partition_names(manifest: Dict[str, Any]) -> Dict[str, str]:
+        """Partition file of every live PDF in a snapshot manifest"""
+        extra = manifest.get('extra', {})
+        if 'partitions' in extra:
+            return extra['partitions']
+        # Snapshots written before versioning name partition files after the PDF
+        return {pdf_id: f"{pdf_id}.faiss" for pdf_id in manifest['pdfs'] if pdf_id is not None}
+    
+    def _read_partition(self, filename: str):
+        """
+        Load a partition file, memory-mapped when FAISS_MMAP is enabled
+        Mapped partitions are read-only and share the OS page cache across
+        processes, so loading costs milliseconds regardless of index size
+        """
+        path = os.path.join(self.partition_path, filename)
+        if self.mmap_enabled:
+            # Older FAISS builds can only map IVF lists; newer ones map flat codes too
+            mmap_flag = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP)
+            try:
+                return faiss.read_index(path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                logger.warning(f"Could not memory-map partition {filename}, reading it instead: {str(e)}")
+        return faiss.read_index(path)
+    
+    def _write_partition(self, filename: str, partition):
+        """Write a partition file atomically so mapped readers never see a torn file"""
+        path = os.path.join(self.partition_path, filename)
+        tmp_path = path + '.tmp'
+        faiss.write_index(partition, tmp_path)
+        os.replace(tmp_path, path)
     
     def initialize_index(self):
-        """Initialize FAISS index or load from disk"""
-        index_file = os.path.join(self.index_path, 'index.faiss')
-        id_map_file = os.path.join(self.index_path, 'id_map.pkl')
-        pdf_map_file = os.path.join(self.index_path, 'pdf_vector_map.pkl')
+        """
+        Load the newest snapshot: memory-mapped metadata plus one index file per partition
+        A snapshot that fails to load falls back to the previous retained
+        generation instead of starting from an empty index
+        """
+        try:
+            if os.path.exists(os.path.join(self.index_path, 'id_map.pkl')):
+                self._migrate_pickled_metadata()
+        except Exception as e:
+            logger.error(f"Error migrating pickled FAISS metadata: {str(e)}")
         
-        if os.path.exists(index_file) and os.path.exists(id_map_file):
+        generations = self.metadata.generations()
+        for generation in reversed(generations or [None]):
             try:
-                # Load existing index
-                self.index = faiss.read_index(index_file)
-                
-                with open(id_map_file, 'rb') as f:
-                    self.id_map = pickle.load(f)
-                
-                if os.path.exists(pdf_map_file):
-                    with open(pdf_map_file, 'rb') as f:
-                        self.pdf_vector_map = pickle.load(f)
-                
-                logger.info(f"Loaded existing FAISS index with {self.index.ntotal} vectors")
+                self._load_snapshot(generation)
             except Exception as e:
-                logger.error(f"Error loading FAISS index: {str(e)}")
-                self._create_new_index()
-        else:
-            self._create_new_index()
+                logger.error(f"Error loading FAISS snapshot generation {generation}: {str(e)}")
+                continue
+            
+            if generations and generation != generations[-1]:
+                # The broken generations are never loaded again; the next
+                # checkpoint copies rows to a new column set rather than
+                # appending after rows they reference
+                self.metadata.discard_generations(generation, generations[-1] + 1)
+                logger.warning(f"Fell back to FAISS snapshot generation {generation}")
+            logger.info(f"Loaded {len(self.partitions)} FAISS partitions with {self.total_vectors} vectors")
+            return
+        
+        self._create_new_index()
+        self._wal_seq = 0
+    
+    def _load_snapshot(self, generation: Optional[int] = None):
+        """
+        Map a published snapshot (default: the latest) and swap it in,
+        reusing partitions whose files are already loaded
+        """
+        metadata = ChunkMetadataStore(self.metadata.path, self.dimension)
+        metadata.load(generation)
+        names = self._snapshot_partition_names({'pdfs': metadata.pdfs, 'extra': metadata.extra})
+        
+        partitions = {}
+        for pdf_id in metadata.pdf_ids():
+            if pdf_id in self.partitions and self._partition_names.get(pdf_id) == names[pdf_id]:
+                partitions[pdf_id] = self.partitions[pdf_id]
+            else:
+                partitions[pdf_id] = self._read_partition(names[pdf_id])
+                self._configure_search_params(partitions[pdf_id])
+        
+        with self._rw_lock.write():
+            self.partitions = partitions
+            self.metadata = metadata
+            self._partition_names = {pdf_id: names[pdf_id] for pdf_id in partitions}
+            self._dirty_partitions = set()
+            self._wal_seq = metadata.extra.get('wal_seq', 0)
+            self._mongo_watermark = metadata.extra.get('mongo_watermark')
+    
+    def _replay_wal(self):
+        """Re-apply journaled mutations newer than the last checkpoint"""
+        replayed = 0
+        
+        for record in self.wal.replay():
+            # Records already folded into the checkpoint are skipped
+            if record['seq'] <= self._wal_seq:
+                continue
+            
+            if record['op'] == 'add':
+                # Ids are re-allocated: they match the journaled ones unless the
+                # store fell back to an older snapshot or was compacted since
+                self._apply_add(
+                    record['pdf_id'],
+                    record['vectors'],
+                    self._allocate_ids(len(record['vectors'])),
+                    record['chunks'],
+                    record['chunk_indices']
+                )
+            elif record['op'] == 'remove':
+                self._apply_remove(record['pdf_id'])
+            
+            self._wal_seq = record['seq']
+            replayed += 1
+        
+        self._records_since_checkpoint += replayed
+        if replayed:
+            logger.info(f"Replayed {replayed} WAL records on top of the last checkpoint")
+    
+    @contextmanager
+    def _exclusive(self):
+        """
+        Serialize a mutation with the other writers of this process and,
+        in shared mode, with every other worker process
+        The outermost holder first catches up with checkpoints published by
+        other workers and with any log tail a crashed writer left behind, so
+        ids keep being allocated from the latest state
+        """
+        with self._write_mutex:
+            if not self.shared:
+                yield
+                return
+            
+            with self._file_lock.exclusive():
+                self._exclusive_depth += 1
+                try:
+                    if self._exclusive_depth == 1:
+                        self._sync_from_disk(force=True)
+                        self._replay_wal()
+                    yield
+                finally:
+                    self._exclusive_depth -= 1
+    
+    def _sync_from_disk(self, force: bool = False):
+        """
+        Re-map the latest checkpoint if another worker has published one
+        Checks at most once per FAISS_SYNC_INTERVAL unless forced; searches
+        skip the check while a writer of this process is running
+        """
+        if not self.shared:
+            return
+        
+        now = time.monotonic()
+        if not force and now - self._last_sync < self.sync_interval:
+            return
+        
+        if not self._write_mutex.acquire(blocking=False):
+            return
+        try:
+            self._last_sync = now
+            if self.metadata.manifest_stamp() == self.metadata.generation:
+                return
+            
+            # Writers publish under the exclusive lock, so holding it shared
+            # guarantees the manifest and partition files match
+            with self._file_lock.shared():
+                self._load_snapshot()
+            
+            logger.info(f"Synced FAISS snapshot generation {self.metadata.generation} with {self.total_vectors} vectors")
+        finally:
+            self._write_mutex.release()
+    
+    def _migrate_pickled_metadata(self):
+        """
+        Convert a pickled checkpoint (id_map.pkl / pdf_vector_map.pkl) to the
+        columnar metadata layout, splitting a legacy global index.faiss into
+        partitions and wrapping positional partitions with their stable ids
+        """
+        logger.info("Migrating pickled FAISS metadata to the columnar store...")
+        legacy_index_file = os.path.join(self.index_path, 'index.faiss')
+        id_map_file = os.path.join(self.index_path, 'id_map.pkl')
+        pdf_map_file = os.path.join(self.index_path, 'pdf_vector_map.pkl')
+        state_file = os.path.join(self.index_path, 'state.pkl')
+        
+        with open(id_map_file, 'rb') as f:
+            id_map = pickle.load(f)
+        
+        with open(pdf_map_file, 'rb') as f:
+            pdf_vector_map = pickle.load(f)
+        
+        state = {}
+        if os.path.exists(state_file):
+            with open(state_file, 'rb') as f:
+                state = pickle.load(f)
+        
+        legacy_index = faiss.read_index(legacy_index_file) if os.path.exists(legacy_index_file) else None
+        
+        vectors_by_id = {}
+        for pdf_id, ids in pdf_vector_map.items():
+            if legacy_index is not None:
+                vectors = np.vstack([legacy_index.reconstruct(int(idx)) for idx in ids])
+            else:
+                partition = faiss.read_index(self._partition_file(pdf_id))
+                if isinstance(partition, faiss.IndexIDMap2):
+                    vectors = faiss.downcast_index(partition.index).reconstruct_n(0, partition.ntotal)
+                    ids = faiss.vector_to_array(partition.id_map)
+                else:
+                    # Positional partitions predate stable ids
+                    vectors = partition.reconstruct_n(0, partition.ntotal)
+                    faiss.write_index(self._partition_from_vectors(vectors, ids), self._partition_file(pdf_id))
+            
+            vectors_by_id.update(zip((int(idx) for idx in ids), vectors))
+            
+            if legacy_index is not None:
+                faiss.write_index(self._partition_from_vectors(vectors, ids), self._partition_file(pdf_id))
+        
+        # Rows are written in id order so every vector keeps its id; exact
+        # vectors are only kept when partitions are quantized
+        self.metadata.reset()
+        for faiss_idx in sorted(id_map):
+            self.metadata.pad_to(faiss_idx)
+            entry = id_map[faiss_idx]
+            self.metadata.append(
+                entry['pdf_id'],
+                [faiss_idx],
+                [entry['chunk_text']],
+                [entry['chunk_index']],
+                [vectors_by_id[faiss_idx]] if self.quantization != 'none' else None
+            )
+        self.metadata.pad_to(state.get('next_id', 0))
+        
+        self.metadata.flush({'wal_seq': state.get('wal_seq', 0)})
+        
+        for path in (id_map_file, pdf_map_file, state_file, legacy_index_file):
+            if os.path.exists(path):
+                os.remove(path)
+        
+        logger.info(f"Migrated metadata for {len(id_map)} vectors from {len(pdf_vector_map)} PDFs")
     
     def _create_new_index(self):
-        """Create a new FAISS index"""
-        # Using IndexFlatIP for Inner Product (cosine similarity after normalization)
-        self.index = faiss.IndexFlatIP(self.dimension)
-        self.id_map = {}
-        self.pdf_vector_map = {}
+        """Reset the store to an empty set of partitions"""
+        self.partitions = {}
+        self.metadata.reset()
+        self._dirty_partitions = set()
+        self._partition_names = {}
         logger.info("Created new FAISS index")
     
+    def _new_partition_index(self, vectors: np.ndarray, count: Optional[int] = None):
+        """
+        Create (and train if needed) the FAISS index backing a single PDF partition
+        Approximate modes only kick in once a partition has min_train_size vectors;
+        smaller partitions fall back to an exact flat scan. Vectors are encoded
+        with the configured quantizer (flat float32, fp16, SQ8 or PQ).
+        
+        Args:
+            vectors: Normalized vectors used for training (at least
+                     _training_rows() of them, or the whole partition)
+            count: Number of vectors the partition will hold (defaults to len(vectors))
+        
+        Returns:
+            IndexIDMap2 wrapping the partition's base index
+        """
+        if count is None:
+            count = len(vectors)
+        codec = self._codec_description(count)
+        
+        if self.index_mode == 'ivf' and count >= self.index_params['min_train_size']:
+            # Keep ~39 training points per centroid as FAISS recommends
+            nlist = max(1, min(self.index_params['nlist'], len(vectors) // 39))
+            description = f"IVF{nlist},{codec}"
+        elif self.index_mode == 'hnsw' and count >= self.index_params['min_train_size']:
+            hnsw_m = self.index_params['hnsw_m']
+            description = f"HNSW{hnsw_m}" if codec == 'Flat' else f"HNSW{hnsw_m}_{codec}"
+        else:
+            description = codec
+        
+        # Inner Product gives cosine similarity after normalization
+        base = faiss.index_factory(self.dimension, description, faiss.METRIC_INNER_PRODUCT)
+        
+        if isinstance(base, faiss.IndexHNSW):
+            base.hnsw.efConstruction = self.index_params['ef_construction']
+        
+        if not base.is_trained:
+            base.train(vectors)
+        
+        # Wrapped in IndexIDMap2 so vectors carry stable int64 ids across the store
+        partition = faiss.IndexIDMap2(base)
+        self._configure_search_params(partition)
+        return partition
+    
+    def _training_rows(self) -> int:
+        """Training sample size that lets any partition train as if it were built whole"""
+        rows = 0
+        if self.index_mode == 'ivf':
+            rows = self.index_params['nlist'] * 39
+        if self.quantization == 'pq':
+            rows = max(rows, PQ_MIN_TRAIN_SIZE)
+        return rows
+    
+    def _codec_description(self, count: int) -> str:
+        """index_factory code description for the configured quantization"""
+        if self.quantization == 'pq':
+            # 8-bit PQ needs enough points to train 256 centroids per sub-quantizer
+            if count >= PQ_MIN_TRAIN_SIZE:
+                return f"PQ{self.pq_m}"
+            return 'SQ8'
+        
+        return {'sq8': 'SQ8', 'fp16': 'SQfp16'}.get(self.quantization, 'Flat')
+    
+    def _configure_search_params(self, partition):
+        """Apply the configured nprobe / efSearch to a partition's base index"""
+        base = faiss.downcast_index(partition.index)
+        
+        if isinstance(base, faiss.IndexIVF):
+            base.nprobe = min(self.index_params['nprobe'], base.nlist)
+        elif isinstance(base, faiss.IndexHNSW):
+            base.hnsw.efSearch = self.index_params['ef_search']
+    
+    @staticmethod
+    def _partition_codec(partition) -> str:
+        """How a partition encodes its vectors: flat, fp16, sq8 or pq"""
+        base = faiss.downcast_index(partition.index)
+        if isinstance(base, faiss.IndexHNSW):
+            base = faiss.downcast_index(base.storage)
+        
+        if isinstance(base, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+            return 'pq'
+        if isinstance(base, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+            return 'fp16' if base.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else 'sq8'
+        return 'flat'
+    
+    def _partition_memory_bytes(self, partition) -> int:
+        """Estimated resident size of a partition (codes, ids, graph or centroids)"""
+        base = faiss.downcast_index(partition.index)
+        nbytes = partition.ntotal * 8  # IndexIDMap2 id array
+        
+        if isinstance(base, faiss.IndexIVF):
+            nbytes += partition.ntotal * (base.code_size + 8) + base.nlist * self.dimension * 4
+        elif isinstance(base, faiss.IndexHNSW):
+            storage = faiss.downcast_index(base.storage)
+            nbytes += partition.ntotal * storage.sa_code_size() + base.hnsw.neighbors.size() * 4
+        else:
+            nbytes += partition.ntotal * base.sa_code_size()
+        
+        return nbytes
+    
+    @staticmethod
+    def _partition_kind(partition) -> str:
+        """Short name of the base index type of a partition"""
+        base = faiss.downcast_index(partition.index)
+        
+        if isinstance(base, faiss.IndexIVF):
+            return 'ivf'
+        if isinstance(base, faiss.IndexHNSW):
+            return 'hnsw'
+        return 'flat'
+    
+    def _partition_from_vectors(self, vectors: np.ndarray, ids: List[int]):
+        """Build a partition from normalized vectors and their global ids"""
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        partition = self._new_partition_index(vectors)
+        partition.add_with_ids(vectors, np.asarray(ids, dtype='int64'))
+        return partition
+    
+    @staticmethod
+    def _prepare_vectors(embeddings) -> np.ndarray:
+        """Convert embeddings to contiguous float32 and normalize for cosine similarity"""
+        if not isinstance(embeddings, np.ndarray):
+            embeddings = np.array(embeddings)
+        
+        vectors = np.ascontiguousarray(embeddings, dtype='float32').copy()
+        faiss.normalize_L2(vectors)
+        return vectors
+    
+    def _allocate_ids(self, count: int) -> List[int]:
+        """Hand out a block of stable global ids (the next metadata rows)"""
+        start_id = self.metadata.rows
+        return list(range(start_id, start_id + count))
+    
+    def _apply_add(
+        self,
+        pdf_id: str,
+        vectors: np.ndarray,
+        ids: List[int],
+        chunks: List[str],
+        chunk_indices: List[int]
+    ):
+        """Build and install a PDF partition in memory (used by WAL replay)"""
+        partition = self._partition_from_vectors(vectors, ids)
+        self._install_partition(pdf_id, partition, vectors, ids, chunks, chunk_indices)
+    
+    def _install_partition(
+        self,
+        pdf_id: str,
+        partition,
+        vectors: np.ndarray,
+        ids: List[int],
+        chunks: List[str],
+        chunk_indices: List[int]
+    ):
+        """Swap a built partition and its metadata rows into the store (no disk I/O)"""
+        # Replacing a PDF's vectors starts from a fresh partition
+        if pdf_id in self.partitions:
+            self._apply_remove(pdf_id)
+        
+        self.metadata.append(pdf_id, ids, chunks, chunk_indices, self._exact_vectors(partition, vectors))
+        self.partitions[pdf_id] = partition
+        self._dirty_partitions.add(pdf_id)
+    
+    def _exact_vectors(self, partition, vectors: np.ndarray) -> Optional[np.ndarray]:
+        """Vectors to keep for re-scoring a partition; flat partitions already score exactly"""
+        return None if self._partition_codec(partition) == 'flat' else vectors
+    
+    def _apply_remove(self, pdf_id: str) -> int:
+        """Drop a PDF partition and tombstone its metadata rows (no disk I/O)"""
+        partition = self.partitions.pop(pdf_id, None)
+        self._dirty_partitions.discard(pdf_id)
+        self._partition_names.pop(pdf_id, None)
+        self.metadata.remove_pdf(pdf_id)
+        
+        return partition.ntotal if partition is not None else 0
+    
+    def _journal(self, record: Dict[str, Any]):
+        """Append a mutation to the write-ahead log before applying it"""
+        self._wal_seq += 1
+        record['seq'] = self._wal_seq
+        self.wal.append(record)
+        self._records_since_checkpoint += 1
+    
+    def _maybe_checkpoint(self):
+        """
+        Fold the log into a checkpoint once enough records have accumulated
+        In shared mode every mutation is checkpointed so other workers can map it
+        """
+        if self.shared or self._records_since_checkpoint >= self.checkpoint_interval:
+            self.save_index()
+    
     def add_vectors(
         self, 
         pdf_id: str, 
@@ -98,38 +577,11 @@ class FAISSVectorStore:
             bool: Success status
         """
         try:
-            if not isinstance(embeddings, np.ndarray):
-                embeddings = np.array(embeddings)
-            
-            embeddings = embeddings.astype('float32')
-            
-            # Normalize vectors for cosine similarity
-            faiss.normalize_L2(embeddings)
-            
-            # Get starting index
-            start_idx = self.index.ntotal
-            
-            # Add vectors to index
-            self.index.add(embeddings)
+            embeddings = self._prepare_vectors(embeddings)
             
-            # Track vector indices for this PDF
-            if pdf_id not in self.pdf_vector_map:
-                self.pdf_vector_map[pdf_id] = []
-            
-            # Update metadata maps
-            for i, (chunk, chunk_idx) in enumerate(zip(chunks, chunk_indices)):
-                faiss_idx = start_idx + i
-                
-                self.id_map[faiss_idx] = {
-                    'pdf_id': pdf_id,
-                    'chunk_text': chunk,
-                    'chunk_index': chunk_idx
-                }
-                
-                self.pdf_vector_map[pdf_id].append(faiss_idx)
-            
-            # Save to disk
-            self.save_index()
+            with self._exclusive():
+                self._add_pdf(pdf_id, embeddings, chunks, chunk_indices)
+                self._maybe_checkpoint()
             
             logger.info(f"Added {len(embeddings)} vectors for PDF {pdf_id}")
             return True
@@ -138,6 +590,33 @@ class FAISSVectorStore:
             logger.error(f"Error adding vectors to FAISS: {str(e)}")
             return False
     
+    def _add_pdf(
+        self,
+        pdf_id: str,
+        embeddings: np.ndarray,
+        chunks: List[str],
+        chunk_indices: List[int]
+    ):
+        """Journal and install a PDF's prepared vectors (caller holds the writer lock)"""
+        ids = self._allocate_ids(len(embeddings))
+        
+        # Each PDF gets its own sub-index so filtered searches only touch its vectors;
+        # building (and training) it does not block searches
+        partition = self._partition_from_vectors(embeddings, ids)
+        
+        # Journal the add (O(PDF) bytes) instead of rewriting the whole store
+        self._journal({
+            'op': 'add',
+            'pdf_id': pdf_id,
+            'ids': ids,
+            'vectors': embeddings,
+            'chunks': list(chunks),
+            'chunk_indices': list(chunk_indices)
+        })
+        
+        with self._rw_lock.write():
+            self._install_partition(pdf_id, partition, embeddings, ids, chunks, chunk_indices)
+    
     def search(
         self, 
         query_embedding: np.ndarray, 
@@ -155,61 +634,161 @@ class FAISSVectorStore:
         Returns:
             List of dictionaries with similarity results
         """
+        self._sync_from_disk()
+        
+        if pdf_id and pdf_id not in self.partitions:
+            logger.warning(f"PDF {pdf_id} not found in vector store")
+            return []
+        
+        results = self.search_batch(query_embedding, [pdf_id], top_k)
+        if not results:
+            return []
+        
+        logger.info(f"Found {len(results[0])} similar vectors")
+        return results[0]
+    
+    def search_batch(
+        self,
+        queries: np.ndarray,
+        filters: Optional[List[Any]] = None,
+        top_k: int = 5
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search many query vectors at once
+        Queries are grouped by the partitions they target, so each partition
+        answers all of its queries with a single FAISS call
+        
+        Args:
+            queries: Query matrix (shape: [n, 384])
+            filters: Optional per-query filter: None (all PDFs), a PDF ID,
+                     or a list of PDF IDs
+            top_k: Number of results to return per query
+        
+        Returns:
+            One list of similarity results per query (empty list on error)
+        """
         try:
-            if self.index.ntotal == 0:
-                logger.warning("FAISS index is empty")
-                return []
-            
-            # Prepare query
-            if not isinstance(query_embedding, np.ndarray):
-                query_embedding = np.array(query_embedding)
+            self._sync_from_disk()
             
-            query = query_embedding.reshape(1, -1).astype('float32')
-            faiss.normalize_L2(query)
+            # Prepare queries without touching the caller's array
+            queries = np.array(queries, dtype='float32').reshape(-1, self.dimension)
+            faiss.normalize_L2(queries)
             
-            # If filtering by PDF, search more and filter later
-            search_k = top_k * 10 if pdf_id else top_k
-            search_k = min(search_k, self.index.ntotal)
+            num_queries = len(queries)
+            if filters is None:
+                filters = [None] * num_queries
+            if len(filters) != num_queries:
+                raise ValueError(f"Expected {num_queries} filters, got {len(filters)}")
             
-            # Perform search
-            similarities, indices = self.index.search(query, search_k)
+            candidates = [[] for _ in range(num_queries)]
             
-            # Collect results
-            results = []
-            for score, idx in zip(similarities[0], indices[0]):
-                if idx == -1:  # FAISS returns -1 for invalid indices
-                    continue
+            with self._rw_lock.read():
+                if not self.partitions:
+                    logger.warning("FAISS index is empty")
+                    return candidates
                 
-                if idx in self.id_map:
-                    metadata = self.id_map[idx]
+                # Route each query to its PDFs' partitions, or fan out over all partitions
+                rows_by_pdf = {}
+                for row, pdf_filter in enumerate(filters):
+                    if not pdf_filter:
+                        target_pdf_ids = self.partitions.keys()
+                    elif isinstance(pdf_filter, str):
+                        target_pdf_ids = [pdf_filter]
+                    else:
+                        target_pdf_ids = pdf_filter
                     
-                    # Filter by PDF if specified
-                    if pdf_id and metadata['pdf_id'] != pdf_id:
-                        continue
-                    
-                    results.append({
-                        'faiss_id': int(idx),
-                        'similarity': float(score),
-                        'pdf_id': metadata['pdf_id'],
-                        'chunk_text': metadata['chunk_text'],
-                        'chunk_index': metadata['chunk_index']
-                    })
-                    
-                    # Stop if we have enough results
-                    if len(results) >= top_k:
-                        break
+                    for target_pdf_id in target_pdf_ids:
+                        if target_pdf_id in self.partitions:
+                            rows_by_pdf.setdefault(target_pdf_id, []).append(row)
+                
+                for target_pdf_id, rows in rows_by_pdf.items():
+                    partition_results = self._search_partition(target_pdf_id, queries[rows], top_k)
+                    for row, results in zip(rows, partition_results):
+                        candidates[row].extend(results)
             
-            logger.info(f"Found {len(results)} similar vectors")
-            return results
+            return [
+                heapq.nlargest(top_k, row_candidates, key=lambda x: x['similarity'])
+                for row_candidates in candidates
+            ]
             
         except Exception as e:
             logger.error(f"Error searching FAISS index: {str(e)}")
             return []
     
+    def _search_partition(self, pdf_id: str, queries: np.ndarray, top_k: int) -> List[List[Dict[str, Any]]]:
+        """
+        Search a single PDF partition with already normalized queries
+        
+        Args:
+            pdf_id: PDF document ID of the partition
+            queries: Normalized query matrix (shape: [n, 384])
+            top_k: Number of results to return per query
+        
+        Returns:
+            One list of similarity results per query
+        """
+        partition = self.partitions[pdf_id]
+        
+        # Quantized partitions over-fetch candidates for exact re-scoring
+        rerank = self.rerank_factor > 0 and self._partition_codec(partition) != 'flat'
+        search_k = min(top_k * self.rerank_factor if rerank else top_k, partition.ntotal)
+        if search_k == 0:
+            return [[] for _ in range(len(queries))]
+        
+        similarities, indices = partition.search(queries, search_k)
+        
+        all_results = []
+        for query, row_scores, row_ids in zip(queries, similarities, indices):
+            # FAISS returns -1 for invalid indices
+            found = row_ids != -1
+            scores, faiss_ids = row_scores[found], row_ids[found]
+            
+            if rerank:
+                scores, faiss_ids = self._rerank_exact(query, scores, faiss_ids)
+            
+            results = []
+            for score, faiss_idx in zip(scores, faiss_ids):
+                if len(results) >= top_k:
+                    break
+                
+                metadata = self.metadata.get(int(faiss_idx))
+                if metadata is None:
+                    continue
+                
+                results.append({
+                    'faiss_id': int(faiss_idx),
+                    'similarity': float(score),
+                    'pdf_id': metadata['pdf_id'],
+                    'chunk_text': metadata['chunk_text'],
+                    'chunk_index': metadata['chunk_index']
+                })
+            
+            all_results.append(results)
+        
+        return all_results
+    
+    def _rerank_exact(self, query: np.ndarray, scores: np.ndarray, faiss_ids: np.ndarray):
+        """
+        Re-score candidates with their exact float32 vectors
+        
+        Args:
+            query: Normalized query vector (shape: [384])
+            scores: Approximate similarities from the quantized index
+            faiss_ids: Candidate ids
+        
+        Returns:
+            Tuple of (scores, faiss_ids) sorted by exact similarity
+        """
+        vectors, has_vector = self.metadata.get_vectors(faiss_ids)
+        exact_scores = np.where(has_vector, vectors @ query, scores)
+        order = np.argsort(-exact_scores, kind='stable')
+        return exact_scores[order], faiss_ids[order]
+    
     def remove_pdf_vectors(self, pdf_id: str) -> bool:
         """
         Remove all vectors for a specific PDF
-        Note: FAISS doesn't support deletion, so we rebuild the index
+        Drops the PDF's partition and its ids, so the cost depends only on
+        that PDF's size; no other vector is touched or renumbered
         
         Args:
             pdf_id: PDF document ID
@@ -218,137 +797,617 @@ class FAISSVectorStore:
             bool: Success status
         """
         try:
-            if pdf_id not in self.pdf_vector_map:
-                logger.warning(f"PDF {pdf_id} not found in vector store")
-                return True
-            
-            # Get indices to remove
-            indices_to_remove = set(self.pdf_vector_map[pdf_id])
-            
-            if not indices_to_remove:
-                return True
-            
-            # Rebuild index without deleted vectors
-            vectors_to_keep = []
-            new_id_map = {}
-            new_pdf_vector_map = {}
-            
-            for idx in range(self.index.ntotal):
-                if idx not in indices_to_remove and idx in self.id_map:
-                    # Get vector from index
-                    vector = self.index.reconstruct(int(idx))
-                    vectors_to_keep.append(vector)
-                    
-                    # Update maps with new index
-                    new_idx = len(vectors_to_keep) - 1
-                    metadata = self.id_map[idx]
-                    new_id_map[new_idx] = metadata
-                    
-                    # Update PDF vector map
-                    current_pdf_id = metadata['pdf_id']
-                    if current_pdf_id not in new_pdf_vector_map:
-                        new_pdf_vector_map[current_pdf_id] = []
-                    new_pdf_vector_map[current_pdf_id].append(new_idx)
+            with self._exclusive():
+                if pdf_id not in self.partitions:
+                    logger.warning(f"PDF {pdf_id} not found in vector store")
+                    return True
+                
+                self._journal({'op': 'remove', 'pdf_id': pdf_id})
+                
+                with self._rw_lock.write():
+                    removed_count = self._apply_remove(pdf_id)
+                
+                self._maybe_checkpoint()
             
-            # Create new index
-            self._create_new_index()
+            logger.info(f"Removed {removed_count} vectors for PDF {pdf_id}")
+            return True
             
-            if vectors_to_keep:
-                vectors_array = np.array(vectors_to_keep).astype('float32')
-                self.index.add(vectors_array)
+        except Exception as e:
+            logger.error(f"Error removing PDF vectors: {str(e)}")
+            return False
+    
+    def save_index(self):
+        """
+        Publish a new snapshot generation of FAISS partitions and metadata
+        and truncate the write-ahead log it supersedes
+        Nothing published is overwritten: new partitions get files named after
+        the generation, and the manifest rename is the single commit point
+        """
+        try:
+            with self._exclusive():
+                generation = self.metadata.next_generation()
+                
+                # Partitions are immutable once written, so only new ones hit the disk;
+                # writing them only reads the indexes, so searches keep running
+                written = {}
+                for pdf_id in list(self._dirty_partitions):
+                    if pdf_id in self.partitions:
+                        filename = f"{pdf_id}.{generation:08d}.faiss"
+                        self._write_partition(filename, self.partitions[pdf_id])
+                        self._partition_names[pdf_id] = filename
+                        if self.mmap_enabled:
+                            written[pdf_id] = self._read_partition(filename)
+                    self._dirty_partitions.discard(pdf_id)
+                
+                # Append new metadata rows; records up to this sequence number
+                # are part of the checkpoint once its manifest is published.
+                # Columns and manifest are written and synced while searches
+                # keep reading the loaded rows; only the remap excludes them.
+                generation = self.metadata.publish({
+                    'wal_seq': self._wal_seq,
+                    'partitions': {pdf_id: self._partition_names[pdf_id] for pdf_id in self.partitions},
+                    'mongo_watermark': self._mongo_watermark
+                })
+                
+                with self._rw_lock.write():
+                    self.metadata.load(generation)
+                    
+                    # Swap freshly written partitions for their mapped copies
+                    # so their heap memory is released
+                    for pdf_id, partition in written.items():
+                        self._configure_search_params(partition)
+                        self.partitions[pdf_id] = partition
+                
+                self.wal.truncate()
+                self._records_since_checkpoint = 0
+                
+                self._prune_snapshots()
+                self._maybe_compact()
             
-            self.id_map = new_id_map
-            self.pdf_vector_map = new_pdf_vector_map
+            logger.info(f"FAISS snapshot generation {self.metadata.generation} saved successfully")
             
-            # Save updated index
-            self.save_index()
+        except Exception as e:
+            logger.error(f"Error saving FAISS index: {str(e)}")
+    
+    def _prune_snapshots(self):
+        """Drop generations beyond the retention window and partition files none of the kept ones use"""
+        retained = self.metadata.prune(self.snapshot_retain)
+        
+        in_use = set(self._partition_names.values())
+        for manifest in retained:
+            in_use.update(self._snapshot_partition_names(manifest).values())
+        
+        for filename in os.listdir(self.partition_path):
+            if filename not in in_use:
+                os.remove(os.path.join(self.partition_path, filename))
+    
+    def rollback(self, generation: int) -> bool:
+        """
+        Restore a retained snapshot generation
+        It is republished as the newest generation, so shared workers pick it
+        up, and the WAL is truncated. The generations it replaces stay
+        retained (within FAISS_SNAPSHOT_RETAIN), so a rollback can be undone
+        by rolling back to the generation that was current before it
+        
+        Args:
+            generation: Snapshot generation to restore
+        
+        Returns:
+            bool: Success status
+        """
+        try:
+            with self._exclusive():
+                if generation not in self.metadata.generations():
+                    logger.warning(f"FAISS snapshot generation {generation} is not retained")
+                    return False
+                
+                self._load_snapshot(generation)
+                self.save_index()
             
-            logger.info(f"Removed {len(indices_to_remove)} vectors for PDF {pdf_id}")
+            logger.info(f"Rolled FAISS store back to generation {generation} ({self.total_vectors} vectors)")
             return True
             
         except Exception as e:
-            logger.error(f"Error removing PDF vectors: {str(e)}")
+            logger.error(f"Error rolling back FAISS snapshot: {str(e)}")
             return False
     
-    def save_index(self):
-        """Save FAISS index and metadata to disk"""
+    def _tombstone_ratio(self) -> float:
+        """Share of metadata rows that belong to deleted PDFs"""
+        rows = self.metadata.rows
+        return 1 - self.total_vectors / rows if rows else 0.0
+    
+    def _maybe_compact(self):
+        """Start a background compaction once tombstones pass FAISS_COMPACT_RATIO"""
+        if self.compact_ratio > 0 and self._tombstone_ratio() >= self.compact_ratio:
+            self.compact(background=True)
+    
+    def compact(self, background: bool = True) -> bool:
+        """
+        Rewrite the store without tombstoned rows and rebuild every partition,
+        re-training IVF / PQ partitions on the vectors they hold now
+        Partitions and their metadata columns are rebuilt outside the writer
+        lock from a captured view, so searches and ingestion keep running;
+        PDFs written meanwhile are folded in before the compacted snapshot is
+        published
+        
+        Args:
+            background: Run in a background thread and return immediately
+        
+        Returns:
+            bool: Whether compaction was started (background) or succeeded
+        """
+        if not background:
+            return self._compact()
+        
+        with self._write_mutex:
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return False
+            self._compaction_thread = threading.Thread(target=self._compact, name='faiss-compaction', daemon=True)
+            self._compaction_thread.start()
+        return True
+    
+    def _compact(self) -> bool:
+        compacted = None
         try:
-            index_file = os.path.join(self.index_path, 'index.faiss')
-            id_map_file = os.path.join(self.index_path, 'id_map.pkl')
-            pdf_map_file = os.path.join(self.index_path, 'pdf_vector_map.pkl')
+            with self._exclusive():
+                captured = dict(self.partitions)
+                source = self.metadata
             
-            # Save FAISS index
-            faiss.write_index(self.index, index_file)
+            compacted = ChunkMetadataStore(source.path, self.dimension)
+            compacted.reset()
+            rebuilt = {
+                pdf_id: self._compact_partition(pdf_id, partition, source, compacted)
+                for pdf_id, partition in captured.items()
+            }
             
-            # Save metadata
-            with open(id_map_file, 'wb') as f:
-                pickle.dump(self.id_map, f)
+            # Written to a building column set now, so publishing it is a rename
+            compacted.spill()
             
-            with open(pdf_map_file, 'wb') as f:
-                pickle.dump(self.pdf_vector_map, f)
+            with self._exclusive():
+                # PDFs replaced or removed while compacting lose their rebuilt copy
+                for pdf_id in list(rebuilt):
+                    if self.partitions.get(pdf_id) is not captured[pdf_id]:
+                        del rebuilt[pdf_id]
+                        compacted.remove_pdf(pdf_id)
+                
+                # PDFs added or replaced meanwhile are compacted now
+                for pdf_id, partition in self.partitions.items():
+                    if pdf_id not in rebuilt:
+                        rebuilt[pdf_id] = self._compact_partition(pdf_id, partition, self.metadata, compacted)
+                
+                reclaimed = self.metadata.rows - compacted.rows
+                compacted.spill()
+                
+                with self._rw_lock.write():
+                    self.partitions = rebuilt
+                    self.metadata = compacted
+                    self._partition_names = {}
+                    self._dirty_partitions = set(rebuilt)
+                
+                self.save_index()
             
-            logger.info("FAISS index and metadata saved successfully")
+            logger.info(f"Compacted FAISS store: dropped {reclaimed} tombstoned rows, rebuilt {len(rebuilt)} partitions")
+            return True
             
         except Exception as e:
-            logger.error(f"Error saving FAISS index: {str(e)}")
+            logger.error(f"Error compacting FAISS store: {str(e)}")
+            if compacted is not None and compacted is not self.metadata:
+                compacted.discard_unpublished()
+            return False
+    
+    def _compact_partition(self, pdf_id: str, partition, source: ChunkMetadataStore, compacted: ChunkMetadataStore):
+        """
+        Copy a PDF's rows into the compacted metadata under fresh dense ids
+        and build its partition from them
+        
+        Returns:
+            The rebuilt (re-trained) partition
+        """
+        with self._rw_lock.read():
+            old_ids = faiss.vector_to_array(partition.id_map)
+            vectors, has_vector = source.get_vectors(old_ids)
+            rows = [source.get(int(faiss_idx)) for faiss_idx in old_ids]
+        
+        # Rows without a stored exact vector (flat partitions, older stores)
+        # are decoded from the partition
+        if not has_vector.all():
+            base = faiss.downcast_index(partition.index)
+            if isinstance(base, faiss.IndexIVF):
+                base.make_direct_map()
+            for i in np.flatnonzero(~has_vector):
+                vectors[i] = partition.reconstruct(int(old_ids[i]))
+        
+        ids = list(range(compacted.rows, compacted.rows + len(old_ids)))
+        rebuilt = self._partition_from_vectors(vectors, ids)
+        compacted.append(
+            pdf_id,
+            ids,
+            [row['chunk_text'] for row in rows],
+            [row['chunk_index'] for row in rows],
+            self._exact_vectors(rebuilt, vectors)
+        )
+        return rebuilt
     
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about the vector store"""
+        self._sync_from_disk()
+        
+        partitions_by_kind = {'flat': 0, 'ivf': 0, 'hnsw': 0}
+        memory_by_codec = {
+            codec: {'partitions': 0, 'vectors': 0, 'bytes': 0, 'exact_vector_bytes': 0}
+            for codec in ('flat', 'fp16', 'sq8', 'pq')
+        }
+        
+        with self._rw_lock.read():
+            for partition in self.partitions.values():
+                partitions_by_kind[self._partition_kind(partition)] += 1
+                codec_stats = memory_by_codec[self._partition_codec(partition)]
+                codec_stats['partitions'] += 1
+                codec_stats['vectors'] += partition.ntotal
+                codec_stats['bytes'] += self._partition_memory_bytes(partition)
+                if self._partition_codec(partition) != 'flat':
+                    # Exact copies kept in the metadata for re-scoring
+                    codec_stats['exact_vector_bytes'] += partition.ntotal * self.dimension * 4
+            
+            # Read together so compaction cannot swap the store mid-snapshot
+            total_partitions = len(self.partitions)
+            total_vectors = self.total_vectors
+            metadata_stats = self.metadata.get_stats()
+            snapshots = {
+                'generation': self.metadata.generation,
+                'retained': self.metadata.generations(),
+                'tombstone_ratio': round(self._tombstone_ratio(), 3),
+                'compacting': self._compaction_thread is not None and self._compaction_thread.is_alive(),
+                'rebuilding': self._rebuild_lock.locked()
+            }
+        
+        index_bytes = sum(codec_stats['bytes'] for codec_stats in memory_by_codec.values())
+        exact_vector_bytes = metadata_stats['vector_bytes']
+        
         return {
-            'total_vectors': self.index.ntotal if self.index else 0,
-            'total_pdfs': len(self.pdf_vector_map),
+            'total_vectors': total_vectors,
+            'total_pdfs': total_partitions,
+            'total_partitions': total_partitions,
             'dimension': self.dimension,
-            'index_type': type(self.index).__name__ if self.index else None
+            'index_type': f"partitioned:{self.index_mode}",
+            'index_mode': self.index_mode,
+            'index_params': self.index_params,
+            'partitions_by_kind': partitions_by_kind,
+            'quantization': self.quantization,
+            'rerank_factor': self.rerank_factor,
+            'mmap': self.mmap_enabled,
+            'shared': self.shared,
+            'snapshots': snapshots,
+            'memory': {
+                'index_bytes': index_bytes,
+                # Includes vectors of tombstoned rows until compaction
+                'exact_vector_bytes': exact_vector_bytes,
+                'total_bytes': index_bytes + exact_vector_bytes,
+                'bytes_per_vector': round((index_bytes + exact_vector_bytes) / total_vectors, 1) if total_vectors else 0,
+                'by_codec': memory_by_codec,
+                # Code size of one vector under each quantization mode
+                'code_bytes_per_vector': {
+                    'flat': self.dimension * 4,
+                    'fp16': self.dimension * 2,
+                    'sq8': self.dimension,
+                    'pq': self.pq_m
+                },
+                # Exact vector each quantized row also keeps (mapped, paged in when re-scored)
+                'exact_bytes_per_vector': {
+                    'flat': 0,
+                    'fp16': self.dimension * 4,
+                    'sq8': self.dimension * 4,
+                    'pq': self.dimension * 4
+                }
+            },
+            'wal_records': self._records_since_checkpoint,
+            'wal_bytes': self.wal.size(),
+            'metadata': metadata_stats
         }
     
-    def rebuild_from_mongodb(self):
+    def rebuild_from_mongodb(self, shard: Optional[Tuple[int, int]] = None, background: bool = False) -> bool:
         """
         Rebuild FAISS index from MongoDB data
-        Useful for recovery or migration
+        Useful for recovery or migration. The new index is built as a shadow
+        copy while the live one keeps serving searches and writes, then
+        swapped in atomically and caught up with the PDFs added or deleted
+        meanwhile. Vectors are streamed from a cursor sorted by PDF and chunk
+        and added in FAISS_REBUILD_BLOCK blocks; each block's metadata rows
+        are written to disk before the next is read, so outside the FAISS
+        partitions the rebuild needs memory for one block rather than the
+        corpus. Progress is reported by rebuild_status() and
+        cancel_rebuild() abandons the shadow copy.
+        
+        Args:
+            shard: Optional (shard number, shard count); only PDFs hashed
+                   to that shard are loaded
+            background: Run in a background thread and return immediately
+        
+        Returns:
+            bool: Whether the rebuild was started (background) or succeeded
         """
+        if not self._rebuild_lock.acquire(blocking=False):
+            logger.warning("A FAISS rebuild is already running")
+            return False
+        
+        self._rebuild_cancel.clear()
+        self._rebuild_progress = {
+            'state': 'running',
+            'started_at': time.time(),
+            'total_vectors': 0,
+            'processed_vectors': 0
+        }
+        
+        if not background:
+            return self._rebuild(shard)
+        
+        threading.Thread(target=self._rebuild, args=(shard,), name='faiss-rebuild', daemon=True).start()
+        return True
+    
+    def _rebuild(self, shard: Optional[Tuple[int, int]]) -> bool:
+        """Build the shadow index, swap it in and catch it up (releases _rebuild_lock)"""
+        progress = self._rebuild_progress
+        metadata = None
         try:
-            from app import mongo
             from app.models.vectorstore import VectorStore
+            from app.utils.faiss_shards import shard_for
             
             logger.info("Rebuilding FAISS index from MongoDB...")
             
-            # Clear current index
-            self._create_new_index()
+            # Vectors inserted after this point are picked up by the catch-up sync
+            latest = VectorStore.collection.find_one({}, {'_id': 1}, sort=[('_id', -1)])
             
-            # Group vectors by PDF
-            pipeline = [
-                {
-                    '$group': {
-                        '_id': '$pdf_id',
-                        'vectors': {'$push': '$$ROOT'}
-                    }
-                }
-            ]
+            match = {}
+            if shard is not None:
+                shard_number, shard_count = shard
+                pdf_ids = [
+                    pdf_id for pdf_id in VectorStore.collection.distinct('pdf_id')
+                    if shard_for(pdf_id, shard_count) == shard_number
+                ]
+                match = {'pdf_id': {'$in': pdf_ids}}
             
-            pdf_groups = list(VectorStore.collection.aggregate(pipeline))
+            # Per-PDF vector counts pick each partition's index type up front
+            counts = {
+                str(group['_id']): group['count']
+                for group in VectorStore.collection.aggregate([
+                    {'$match': match},
+                    {'$group': {'_id': '$pdf_id', 'count': {'$sum': 1}}}
+                ])
+            }
+            progress['total_vectors'] = sum(counts.values())
             
-            for group in pdf_groups:
-                pdf_id = str(group['_id'])
-                vectors_data = group['vectors']
-                
-                embeddings = []
-                chunks = []
-                chunk_indices = []
-                
-                for vec in vectors_data:
-                    embeddings.append(vec['embedding'])
+            # The shadow partitions and metadata are private to this thread
+            # until the swap, so searches and writers are not blocked; the
+            # metadata rows go to an unpublished column set block by block
+            partitions = {}
+            metadata = ChunkMetadataStore(self.metadata.path, self.dimension)
+            metadata.reset()
+            
+            # Vectors are decoded into one preallocated buffer and added a block
+            # at a time; a PDF's first block is large enough to train its partition
+            buffer = np.empty((max(self.rebuild_block, self._training_rows()), self.dimension), dtype='float32')
+            rows = 0
+            chunks = []
+            chunk_indices = []
+            current_pdf = None
+            started = time.perf_counter()
+            
+            # Stream vectors PDF by PDF in chunk order
+            VectorStore.collection.create_index([('pdf_id', 1), ('chunk_index', 1)])
+            with VectorStore.collection.find(
+                match,
+                {'pdf_id': 1, 'embedding': 1, 'embedding_dtype': 1, 'chunk_text': 1, 'chunk_index': 1},
+                sort=[('pdf_id', 1), ('chunk_index', 1)],
+                batch_size=self.rebuild_block,
+                allow_disk_use=True
+            ) as cursor:
+                for vec in cursor:
+                    pdf_id = str(vec['pdf_id'])
+                    if rows and (pdf_id != current_pdf or rows == len(buffer)):
+                        self._add_rebuild_block(
+                            partitions, metadata, current_pdf, counts.get(current_pdf, rows),
+                            buffer[:rows], chunks, chunk_indices
+                        )
+                        rows = 0
+                        chunks = []
+                        chunk_indices = []
+                        progress['processed_vectors'] = metadata.rows
+                        
+                        if self._rebuild_cancel.is_set():
+                            metadata.discard_unpublished()
+                            progress.update(state='cancelled', finished_at=time.time())
+                            logger.info(f"Cancelled FAISS rebuild after {progress['processed_vectors']} vectors")
+                            return False
+                    
+                    current_pdf = pdf_id
+                    buffer[rows] = VectorStore.decode_embedding(vec)
                     chunks.append(vec['chunk_text'])
                     chunk_indices.append(vec['chunk_index'])
+                    rows += 1
+            
+            if rows:
+                self._add_rebuild_block(
+                    partitions, metadata, current_pdf, counts.get(current_pdf, rows),
+                    buffer[:rows], chunks, chunk_indices
+                )
+                progress['processed_vectors'] = metadata.rows
+            
+            elapsed = time.perf_counter() - started
+            
+            with self._exclusive():
+                with self._rw_lock.write():
+                    self.partitions = partitions
+                    self.metadata = metadata
+                    self._dirty_partitions = set(partitions)
+                    self._partition_names = {}
+                    self._mongo_watermark = str(latest['_id']) if latest else None
+                
+                # Writes that reached the live index during the build are in
+                # MongoDB too; fold them in before publishing
+                loaded, removed = self._apply_mongo_changes(shard)
                 
-                embeddings_array = np.array(embeddings)
-                self.add_vectors(pdf_id, embeddings_array, chunks, chunk_indices)
+                # One checkpoint for the whole rebuild; it supersedes the current log
+                self.save_index()
             
-            logger.info(f"Rebuilt FAISS index with {self.index.ntotal} vectors from {len(pdf_groups)} PDFs")
+            progress.update(state='completed', finished_at=time.time())
+            logger.info(
+                f"Rebuilt FAISS index with {self.total_vectors} vectors from {len(partitions)} PDFs "
+                f"in {elapsed:.1f}s ({metadata.rows / max(elapsed, 1e-9):.0f} vectors/sec); "
+                f"caught up {loaded} PDFs added and {removed} removed during the build"
+            )
             return True
             
         except Exception as e:
+            # Unless it was swapped in, the shadow metadata is never published
+            if metadata is not None and metadata is not self.metadata:
+                metadata.discard_unpublished()
+            progress.update(state='failed', error=str(e), finished_at=time.time())
             logger.error(f"Error rebuilding FAISS index: {str(e)}")
             return False
+        finally:
+            self._rebuild_lock.release()
+    
+    def rebuild_status(self) -> Dict[str, Any]:
+        """Progress of the running (or last) rebuild with its rate and ETA"""
+        status = dict(self._rebuild_progress)
+        if status['state'] == 'idle':
+            return status
+        
+        elapsed = status.get('finished_at', time.time()) - status['started_at']
+        rate = status['processed_vectors'] / elapsed if elapsed > 0 else 0.0
+        remaining = status['total_vectors'] - status['processed_vectors']
+        
+        status['elapsed_seconds'] = round(elapsed, 1)
+        status['vectors_per_sec'] = round(rate, 1)
+        status['percent'] = round(100.0 * status['processed_vectors'] / status['total_vectors'], 1) if status['total_vectors'] else 0.0
+        status['eta_seconds'] = round(remaining / rate, 1) if status['state'] == 'running' and rate else None
+        return status
+    
+    def cancel_rebuild(self) -> bool:
+        """Ask a running rebuild to stop; the live index is left untouched"""
+        if not self._rebuild_lock.locked():
+            return False
+        
+        self._rebuild_cancel.set()
+        return True
+    
+    def _add_rebuild_block(
+        self,
+        partitions: Dict[str, Any],
+        metadata: ChunkMetadataStore,
+        pdf_id: str,
+        pdf_count: int,
+        vectors: np.ndarray,
+        chunks: List[str],
+        chunk_indices: List[int]
+    ):
+        """Normalize one block of a PDF's vectors, add it to a rebuild's partitions and write its metadata rows"""
+        faiss.normalize_L2(vectors)
+        
+        # The PDF's first block doubles as its partition's training sample
+        if pdf_id not in partitions:
+            partitions[pdf_id] = self._new_partition_index(vectors, pdf_count)
+        
+        ids = np.arange(metadata.rows, metadata.rows + len(vectors), dtype='int64')
+        partitions[pdf_id].add_with_ids(vectors, ids)
+        metadata.append(pdf_id, ids.tolist(), chunks, chunk_indices, self._exact_vectors(partitions[pdf_id], vectors))
+        metadata.spill()
+
+    def sync_from_mongodb(self, shard: Optional[Tuple[int, int]] = None) -> bool:
+        """
+        Incrementally bring FAISS in line with the MongoDB vectorstore collection
+        Only vectors past the _id watermark of the last sync or rebuild are
+        scanned for changed PDFs. PDFs FAISS lacks or holds with a different
+        vector count are (re)loaded, PDFs gone from MongoDB are dropped, and
+        the result is saved as a single checkpoint.
+        
+        Args:
+            shard: Optional (shard number, shard count); only PDFs hashed
+                   to that shard are synced
+        
+        Returns:
+            bool: Success status
+        """
+        try:
+            with self._exclusive():
+                watermark = self._mongo_watermark
+                loaded, removed = self._apply_mongo_changes(shard)
+                
+                # One checkpoint for the whole sync
+                if loaded or removed or watermark != self._mongo_watermark:
+                    self.save_index()
+            
+            logger.info(f"Synced FAISS with MongoDB: loaded {loaded} PDFs, dropped {removed} PDFs")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error syncing FAISS with MongoDB: {str(e)}")
+            return False
+
+    def _apply_mongo_changes(self, shard: Optional[Tuple[int, int]]) -> Tuple[int, int]:
+        """
+        Load PDFs added or changed in MongoDB since the watermark and drop
+        the ones deleted there, then advance the watermark (no checkpoint;
+        caller holds the writer lock)
+        
+        Returns:
+            (PDFs loaded, PDFs removed)
+        """
+        from bson import ObjectId
+        from app.models.vectorstore import VectorStore
+        from app.utils.faiss_shards import shard_for
+        
+        collection = VectorStore.collection
+        latest = collection.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+        
+        mongo_pdf_ids = {
+            str(pdf_id) for pdf_id in collection.distinct('pdf_id')
+            if shard is None or shard_for(pdf_id, shard[1]) == shard[0]
+        }
+        
+        # PDFs with vectors inserted since the last sync, plus any PDF
+        # FAISS does not hold at all (e.g. an add that failed)
+        changed = set()
+        if latest:
+            window = {'$lte': latest['_id']}
+            if self._mongo_watermark:
+                window['$gt'] = ObjectId(self._mongo_watermark)
+            changed = {str(pdf_id) for pdf_id in collection.distinct('pdf_id', {'_id': window})}
+        candidates = (changed & mongo_pdf_ids) | (mongo_pdf_ids - set(self.partitions))
+        
+        removed = [pdf_id for pdf_id in self.partitions if pdf_id not in mongo_pdf_ids]
+        for pdf_id in removed:
+            self._journal({'op': 'remove', 'pdf_id': pdf_id})
+            with self._rw_lock.write():
+                self._apply_remove(pdf_id)
+        
+        loaded = 0
+        for pdf_id in candidates:
+            # Vectors are only fetched for PDFs whose count differs from FAISS
+            count = collection.count_documents({'pdf_id': ObjectId(pdf_id)})
+            if count == 0:
+                continue
+            if pdf_id in self.partitions and self.partitions[pdf_id].ntotal == count:
+                continue
+            
+            vectors_data = list(collection.find(
+                {'pdf_id': ObjectId(pdf_id)},
+                {'embedding': 1, 'embedding_dtype': 1, 'chunk_text': 1, 'chunk_index': 1}
+            ).sort('chunk_index', 1))
+            if not vectors_data:
+                continue
+            
+            self._add_pdf(
+                pdf_id,
+                self._prepare_vectors([VectorStore.decode_embedding(vec) for vec in vectors_data]),
+                [vec['chunk_text'] for vec in vectors_data],
+                [vec['chunk_index'] for vec in vectors_data]
+            )
+            loaded += 1
+        
+        if latest:
+            self._mongo_watermark = str(latest['_id'])
+        return loaded, len(removed)
 
     def search_multiple_pdfs(
         self, 
@@ -368,16 +1427,29 @@ class FAISSVectorStore:
             Combined and ranked results from all PDFs
         """
         try:
-            if self.index.ntotal == 0:
-                logger.warning("⚠️  FAISS index is empty")
-                return []
+            self._sync_from_disk()
+            
+            query = np.array(query_embedding, dtype='float32').reshape(1, -1)
+            faiss.normalize_L2(query)
+            
             all_results = []
-            # Search each PDF individually
-            for pdf_id in pdf_ids:
-                results = self.search(query_embedding, pdf_id, top_k_per_pdf)
-                for result in results:
-                    result['source_pdf_id'] = pdf_id
-                    all_results.append(result)
+            
+            # One pass under a single read lock: each PDF's partition holds only
+            # its own vectors, so the scan covers exactly the union of the PDFs
+            with self._rw_lock.read():
+                if not self.partitions:
+                    logger.warning("⚠️  FAISS index is empty")
+                    return []
+                
+                for pdf_id in dict.fromkeys(pdf_ids):
+                    if pdf_id not in self.partitions:
+                        logger.warning(f"PDF {pdf_id} not found in vector store")
+                        continue
+                    
+                    # Per-PDF quota comes straight from the partition's top-k
+                    for result in self._search_partition(pdf_id, query, top_k_per_pdf)[0]:
+                        result['source_pdf_id'] = pdf_id
+                        all_results.append(result)
             
             # Sort by similarity across all PDFs
             all_results.sort(key=lambda x: x['similarity'], reverse=True)
@@ -389,5 +1461,12 @@ class FAISSVectorStore:
             logger.error(f"❌ Error searching multiple PDFs: {str(e)}")
             return []
 
+def _create_store():
+    """The local store, or a scatter-gather client when FAISS_SHARDS lists shard processes"""
+    if Config.FAISS_SHARDS:
+        from app.utils.faiss_shards import ShardedVectorStore
+        return ShardedVectorStore(Config.FAISS_SHARDS, Config.FAISS_SHARD_AUTHKEY.encode('utf-8'))
+    return FAISSVectorStore()
+
 # Singleton instance
-faiss_store = FAISSVectorStore()
\ No newline at end of file
+faiss_store = _create_store()
\ No newline at end of file
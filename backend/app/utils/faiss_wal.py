@@ -0,0 +1,71 @@
+import os
+import pickle
+import struct
+import zlib
+import logging
+from typing import Any, Dict, Iterator
+
+logger = logging.getLogger(__name__)
+
+class WriteAheadLog:
+    """
+    Append-only journal of vector store mutations
+    Each record is framed as magic + payload length + crc32 + pickled payload,
+    so a torn write at the tail is detected and discarded on replay
+    """
+
+    MAGIC = b'FWAL'
+    HEADER = struct.Struct('<4sII')
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(self.path, 'ab')
+
+    def append(self, record: Dict[str, Any]):
+        """Append a record and fsync it to disk"""
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        header = self.HEADER.pack(self.MAGIC, len(payload), zlib.crc32(payload))
+
+        self._file.write(header + payload)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every intact record in the log
+        A corrupt or partial tail record is truncated away
+        """
+        valid_offset = 0
+
+        with open(self.path, 'rb') as f:
+            while True:
+                header = f.read(self.HEADER.size)
+                if not header:
+                    break
+
+                if len(header) < self.HEADER.size:
+                    logger.warning("Truncated WAL header at tail, discarding")
+                    break
+
+                magic, length, checksum = self.HEADER.unpack(header)
+                payload = f.read(length)
+
+                if magic != self.MAGIC or len(payload) < length or zlib.crc32(payload) != checksum:
+                    logger.warning(f"Corrupt WAL record at offset {valid_offset}, discarding tail")
+                    break
+
+                valid_offset = f.tell()
+                yield pickle.loads(payload)
+
+        if valid_offset < os.path.getsize(self.path):
+            self._file.truncate(valid_offset)
+
+    def truncate(self):
+        """Discard all records after a checkpoint"""
+        self._file.truncate(0)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def size(self) -> int:
+        """Current size of the log in bytes"""
+        return os.fstat(self._file.fileno()).st_size
@@ -0,0 +1,48 @@
+import fcntl
+import os
+from contextlib import contextmanager
+
+class FileLock:
+    """
+    Advisory inter-process lock backed by flock(2)
+    Shared holders exclude exclusive ones across processes. Nested acquisitions
+    in the same process are counted and only the outermost one touches the
+    lock, so a shared request inside an exclusive block keeps it exclusive.
+    Not thread-safe: callers serialize the threads of a process themselves.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._pid = None
+        self._depth = 0
+
+    def _fileno(self) -> int:
+        # flock locks belong to the open file, which a forked worker would share
+        # with its parent, so every process opens the lock file itself
+        if self._pid != os.getpid():
+            self._file = open(self.path, 'a+')
+            self._pid = os.getpid()
+            self._depth = 0
+        return self._file.fileno()
+
+    @contextmanager
+    def _hold(self, operation: int):
+        fileno = self._fileno()
+        if self._depth == 0:
+            fcntl.flock(fileno, operation)
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                fcntl.flock(fileno, fcntl.LOCK_UN)
+
+    def shared(self):
+        """Hold the lock shared for the duration of the block"""
+        return self._hold(fcntl.LOCK_SH)
+
+    def exclusive(self):
+        """Hold the lock exclusively for the duration of the block"""
+        return self._hold(fcntl.LOCK_EX)
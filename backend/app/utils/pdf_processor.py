@@ -1,4 +1,5 @@
 import PyPDF2
+import hashlib
 import os
 import logging
 from werkzeug.utils import secure_filename
@@ -66,6 +67,20 @@ class PDFProcessor:
         logger.info(f"Split text into {len(chunks)} chunks")
         return chunks
     
+    @staticmethod
+    def file_hash(file):
+        """SHA-256 of an uploaded file's bytes; the stream is rewound for saving"""
+        digest = hashlib.sha256()
+        for block in iter(lambda: file.stream.read(1024 * 1024), b''):
+            digest.update(block)
+        file.stream.seek(0)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def chunk_hash(chunk):
+        """SHA-256 of a chunk's text with whitespace runs collapsed"""
+        return hashlib.sha256(' '.join(chunk.split()).encode('utf-8')).hexdigest()
+    
     @staticmethod
     def save_file(file, upload_folder):
         """Save uploaded file"""
@@ -0,0 +1,101 @@
+"""
+Compare embedding backends: parity with PyTorch and CPU throughput
+Encodes the same texts with the SentenceTransformer (PyTorch) backend and
+each given ONNX model, reports the cosine similarity of every ONNX vector
+to its PyTorch vector, single-query latency and batch throughput, and
+exits non-zero when any model falls below --min-cosine
+
+Usage (from the backend directory, after export_onnx_model.py --quantize):
+    python benchmarks/embedding_backend_benchmark.py --onnx onnx_model/model.onnx onnx_model/model_int8.onnx
+"""
+
+import argparse
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+WORDS = (
+    'beam stress load torque circuit voltage current resistance fluid pressure '
+    'thermal conductivity entropy gear shaft bearing algorithm complexity signal '
+    'frequency filter transistor amplifier material strain modulus reaction force'
+).split()
+
+
+def sample_texts(count: int, seed: int = 0) -> list:
+    """Synthetic chunk-like texts of varying length"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    return [
+        ' '.join(rng.choice(WORDS, size=int(rng.integers(8, 160)))).capitalize() + '.'
+        for _ in range(count)
+    ]
+
+
+def measure(model, texts: list, queries: int) -> dict:
+    """Single-query latency and batch throughput of a model"""
+    model.encode(texts[:8])  # Warm up
+
+    latencies = []
+    for text in texts[:queries]:
+        start = time.perf_counter()
+        model.encode(text)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    start = time.perf_counter()
+    embeddings = model.encode(texts)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'embeddings': embeddings,
+        'query_ms': latencies[len(latencies) // 2] * 1000,
+        'texts_per_sec': len(texts) / elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--onnx', nargs='+', required=True, help='Exported .onnx files to compare')
+    parser.add_argument('--texts', type=int, default=512, help='Texts encoded per backend')
+    parser.add_argument('--queries', type=int, default=100, help='Single-text encodes timed per backend')
+    parser.add_argument('--threads', type=int, default=0, help='CPU threads per backend (0 keeps the defaults)')
+    parser.add_argument('--min-cosine', type=float, default=0.99, help='Lowest acceptable cosine to PyTorch')
+    args = parser.parse_args()
+
+    import numpy as np
+    import torch
+    from app.config import Config
+    from app.utils.embedding_backends import OnnxEmbeddingModel, TorchEmbeddingModel
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    texts = sample_texts(args.texts)
+    results = {'torch': measure(TorchEmbeddingModel(Config.EMBEDDING_MODEL), texts, args.queries)}
+    for path in args.onnx:
+        model = OnnxEmbeddingModel(path, threads=args.threads)
+        results[model.name] = measure(model, texts, args.queries)
+
+    reference = results['torch']['embeddings']
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+
+    failed = False
+    print(f"{'backend':<32} {'query ms':>9} {'texts/s':>9} {'min cos':>9} {'mean cos':>9}")
+    for name, result in results.items():
+        embeddings = result['embeddings'] / np.linalg.norm(result['embeddings'], axis=1, keepdims=True)
+        cosines = (embeddings * reference).sum(axis=1)
+        failed |= bool(cosines.min() < args.min_cosine)
+        print(f"{name:<32} {result['query_ms']:>9.2f} {result['texts_per_sec']:>9.1f} "
+              f"{cosines.min():>9.4f} {cosines.mean():>9.4f}")
+
+    if failed:
+        print(f"Parity check failed: cosine to PyTorch below {args.min_cosine}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Benchmark FAISS vector store startup: full reads vs memory-mapped partitions
+Builds a synthetic store in a temporary directory, then loads it repeatedly
+in fresh processes with FAISS_MMAP=false and FAISS_MMAP=true, reporting load
+time and resident memory added by the load. The same corpus is also saved
+in the original layout (one index.faiss plus pickled id_map /
+pdf_vector_map) and loaded the way the original store did, as the baseline
+
+Usage (from the backend directory):
+    python benchmarks/faiss_load_benchmark.py --vectors 200000 --pdfs 200
+Index settings (FAISS_INDEX_TYPE, FAISS_QUANTIZATION, ...) are taken from the environment
+"""
+
+import argparse
+import gc
+import importlib
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = 'baseline'
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def build_store(vectors: int, pdfs: int):
+    """
+    Fill a store in the current directory with random normalized vectors,
+    and save the same corpus in the original single-index pickle layout
+    """
+    import faiss
+    import numpy as np
+    from app.utils.faiss_store import faiss_store
+
+    baseline_index = faiss.IndexFlatIP(faiss_store.dimension)
+    id_map = {}
+    pdf_vector_map = {}
+
+    rng = np.random.default_rng(0)
+    per_pdf = max(1, vectors // pdfs)
+    for i in range(pdfs):
+        pdf_id = f"bench{i:06d}"
+        embeddings = rng.standard_normal((per_pdf, faiss_store.dimension)).astype('float32')
+        chunks = [f"chunk {j} of pdf {i}" for j in range(per_pdf)]
+        faiss_store.add_vectors(pdf_id, embeddings, chunks, list(range(per_pdf)))
+
+        faiss.normalize_L2(embeddings)
+        start = baseline_index.ntotal
+        baseline_index.add(embeddings)
+        for j, chunk in enumerate(chunks):
+            id_map[start + j] = {'pdf_id': pdf_id, 'chunk_text': chunk, 'chunk_index': j}
+        pdf_vector_map[pdf_id] = list(range(start, start + per_pdf))
+    faiss_store.save_index()
+
+    os.makedirs(BASELINE_DIR)
+    faiss.write_index(baseline_index, os.path.join(BASELINE_DIR, 'index.faiss'))
+    with open(os.path.join(BASELINE_DIR, 'id_map.pkl'), 'wb') as f:
+        pickle.dump(id_map, f)
+    with open(os.path.join(BASELINE_DIR, 'pdf_vector_map.pkl'), 'wb') as f:
+        pickle.dump(pdf_vector_map, f)
+
+
+def load_baseline() -> dict:
+    """Time a cold load of the original layout: read the whole index and unpickle both maps"""
+    import faiss
+
+    gc.collect()
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    index = faiss.read_index(os.path.join(BASELINE_DIR, 'index.faiss'))
+    with open(os.path.join(BASELINE_DIR, 'id_map.pkl'), 'rb') as f:
+        id_map = pickle.load(f)
+    with open(os.path.join(BASELINE_DIR, 'pdf_vector_map.pkl'), 'rb') as f:
+        pdf_vector_map = pickle.load(f)
+    elapsed = time.perf_counter() - start
+    rss_after = rss_bytes()
+
+    return {
+        'seconds': elapsed,
+        'rss_delta_bytes': rss_after - rss_before,
+        'vectors': index.ntotal,
+        'pdfs': len(pdf_vector_map),
+        'rows': len(id_map)
+    }
+
+
+def load_store() -> dict:
+    """Time a cold construction of the store (the import-time instance is discarded first)"""
+    # app.utils re-exports the store instance under the module's name
+    store_module = importlib.import_module('app.utils.faiss_store')
+
+    store_module.faiss_store = None
+    store_module.FAISSVectorStore._instance = None
+    gc.collect()
+
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    store = store_module.FAISSVectorStore()
+    elapsed = time.perf_counter() - start
+    rss_after = rss_bytes()
+
+    return {
+        'seconds': elapsed,
+        'rss_delta_bytes': rss_after - rss_before,
+        'vectors': store.total_vectors
+    }
+
+
+def run_child(command: str, workdir: str, env_overrides: dict, *args) -> str:
+    env = dict(os.environ, **env_overrides)
+    env['PYTHONPATH'] = BACKEND_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', command, *args],
+        cwd=workdir, env=env, check=True, capture_output=True, text=True
+    )
+    return result.stdout.strip().splitlines()[-1] if result.stdout.strip() else ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vectors', type=int, default=100000, help='Total vectors in the synthetic store')
+    parser.add_argument('--pdfs', type=int, default=100, help='Number of PDF partitions')
+    parser.add_argument('--repeat', type=int, default=5, help='Loads per mode')
+    parser.add_argument('--child', choices=['build', 'load', 'load-baseline'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child == 'build':
+        build_store(args.vectors, args.pdfs)
+        return
+    if args.child == 'load':
+        print(json.dumps(load_store()))
+        return
+    if args.child == 'load-baseline':
+        print(json.dumps(load_baseline()))
+        return
+
+    workdir = tempfile.mkdtemp(prefix='faiss_load_bench_')
+    try:
+        print(f"Building store with {args.vectors} vectors in {args.pdfs} partitions...")
+        start = time.perf_counter()
+        run_child('build', workdir, {'FAISS_MMAP': 'false', 'FAISS_CHECKPOINT_INTERVAL': str(args.pdfs + 1)},
+                  '--vectors', str(args.vectors), '--pdfs', str(args.pdfs))
+        print(f"Built in {time.perf_counter() - start:.1f}s\n")
+
+        print(f"{'loader':<8} {'median ms':>10} {'min ms':>10} {'rss MB':>10}")
+        for label, command, mmap in (
+            ('pickle', 'load-baseline', 'false'),
+            ('read', 'load', 'false'),
+            ('mmap', 'load', 'true')
+        ):
+            runs = [json.loads(run_child(command, workdir, {'FAISS_MMAP': mmap})) for _ in range(args.repeat)]
+            times = sorted(run['seconds'] * 1000 for run in runs)
+            rss = sorted(run['rss_delta_bytes'] for run in runs)[len(runs) // 2] / (1024 * 1024)
+            print(f"{label:<8} {times[len(times) // 2]:>10.1f} {times[0]:>10.1f} {rss:>10.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
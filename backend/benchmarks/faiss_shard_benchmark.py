@@ -0,0 +1,137 @@
+"""
+Benchmark sharded scatter-gather search against shard count
+For each shard count, starts that many local shard processes on Unix
+sockets, loads the same synthetic corpus through ShardedVectorStore and
+times unfiltered searches from several client threads, reporting median
+latency and queries per second
+
+Usage (from the backend directory):
+    python benchmarks/faiss_shard_benchmark.py --vectors 400000 --pdfs 400 --shards 1,2,4
+Index settings (FAISS_INDEX_TYPE, FAISS_QUANTIZATION, ...) are taken from the environment
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUTHKEY = b'faiss-shard-benchmark'
+
+
+def serve(address: str):
+    """Child process: serve a fresh store in the current directory"""
+    from app.utils.faiss_shards import serve_shard
+    from app.utils.faiss_store import faiss_store
+
+    serve_shard(faiss_store, address, AUTHKEY)
+
+
+def start_shards(count: int, workdir: str) -> tuple:
+    """Start count shard processes, each with its own data directory"""
+    env = dict(os.environ, FAISS_SHARDS='', FAISS_SHARED='false')
+    env['PYTHONPATH'] = BACKEND_DIR + os.pathsep + env.get('PYTHONPATH', '')
+
+    processes, addresses = [], []
+    for shard in range(count):
+        shard_dir = os.path.join(workdir, str(shard))
+        os.makedirs(shard_dir)
+        address = os.path.join(shard_dir, 'shard.sock')
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--child-serve', address],
+            cwd=shard_dir, env=dict(env, FAISS_INDEX_PATH=os.path.join(shard_dir, 'faiss_data'))
+        ))
+        addresses.append(address)
+
+    # Wait for every shard to listen
+    for address in addresses:
+        while not os.path.exists(address):
+            time.sleep(0.05)
+
+    return processes, addresses
+
+
+def run(count: int, args) -> dict:
+    import numpy as np
+    from app.utils.faiss_shards import ShardedVectorStore
+
+    workdir = tempfile.mkdtemp(prefix='faiss_shard_bench_')
+    processes, addresses = start_shards(count, workdir)
+    try:
+        store = ShardedVectorStore(addresses, AUTHKEY)
+
+        rng = np.random.default_rng(0)
+        per_pdf = max(1, args.vectors // args.pdfs)
+        for i in range(args.pdfs):
+            embeddings = rng.standard_normal((per_pdf, 384)).astype('float32')
+            store.add_vectors(f"bench{i:06d}", embeddings, [f"chunk {j}" for j in range(per_pdf)], list(range(per_pdf)))
+
+        queries = rng.standard_normal((args.queries, 384)).astype('float32')
+        store.search(queries[0], top_k=args.top_k)  # Warm up connections
+
+        def timed_search(query):
+            start = time.perf_counter()
+            store.search(query, top_k=args.top_k)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            latencies = sorted(pool.map(timed_search, queries))
+        elapsed = time.perf_counter() - start
+
+        return {
+            'median_ms': latencies[len(latencies) // 2] * 1000,
+            'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000,
+            'qps': len(queries) / elapsed
+        }
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vectors', type=int, default=200000, help='Total vectors in the synthetic corpus')
+    parser.add_argument('--pdfs', type=int, default=200, help='Number of PDFs')
+    parser.add_argument('--shards', default='1,2,4', help='Comma-separated shard counts to compare')
+    parser.add_argument('--queries', type=int, default=200, help='Unfiltered searches per run')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent client threads')
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--child-serve', help=argparse.SUPPRESS)
+    parser.add_argument('--child-run', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_serve:
+        serve(args.child_serve)
+        return
+    if args.child_run:
+        print(json.dumps(run(args.child_run, args)))
+        return
+
+    # Each shard count runs in a fresh client process; importing the store
+    # package there builds a local store, which is kept out of the tree
+    scratch = tempfile.mkdtemp(prefix='faiss_shard_bench_client_')
+    env = dict(os.environ, FAISS_INDEX_PATH=scratch, FAISS_SHARDS='')
+    env['PYTHONPATH'] = BACKEND_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    try:
+        print(f"{'shards':<8} {'median ms':>10} {'p95 ms':>10} {'qps':>10}")
+        for count in (int(value) for value in args.shards.split(',')):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), *sys.argv[1:], '--child-run', str(count)],
+                env=env, check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{count:<8} {result['median_ms']:>10.1f} {result['p95_ms']:>10.1f} {result['qps']:>10.1f}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
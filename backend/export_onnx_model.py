@@ -0,0 +1,98 @@
+"""
+Export the configured SentenceTransformer to ONNX for EMBEDDING_BACKEND=onnx
+Writes model.onnx (fp32), optionally model_int8.onnx (dynamic int8
+quantization), the tokenizer and the pooling settings to the output
+directory. Point EMBEDDING_ONNX_PATH at the .onnx file to serve.
+
+Usage:
+    python export_onnx_model.py                       # onnx_model/model.onnx
+    python export_onnx_model.py --quantize            # also onnx_model/model_int8.onnx
+    python export_onnx_model.py --output /models/minilm --quantize
+"""
+
+from app.config import Config
+from app.utils.embedding_backends import ONNX_CONFIG_FILE
+import argparse
+import json
+import logging
+import os
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def export(model_name, output, quantize):
+    """Export model_name to output; returns the written .onnx paths"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    
+    st_model = SentenceTransformer(model_name, device='cpu')
+    transformer = st_model[0].auto_model.eval()
+    pooling = st_model[1]
+    if not pooling.pooling_mode_mean_tokens:
+        raise ValueError(f"{model_name} does not use mean pooling; only mean pooling is exported")
+    
+    sample = st_model.tokenizer(['An example sentence to trace the graph'], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    
+    class LastHiddenState(torch.nn.Module):
+        """Transformer returning only token embeddings (pooling runs in numpy)"""
+        
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+        
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs)))[0]
+    
+    os.makedirs(output, exist_ok=True)
+    model_path = os.path.join(output, 'model.onnx')
+    
+    # Batch and sequence length stay dynamic
+    dynamic_axes = {name: {0: 'batch', 1: 'tokens'} for name in input_names + ['last_hidden_state']}
+    with torch.no_grad():
+        torch.onnx.export(
+            LastHiddenState(transformer),
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+    logger.info(f"Exported {model_name} to {model_path}")
+    paths = [model_path]
+    
+    config = {
+        'model': model_name,
+        'dimension': st_model.get_sentence_embedding_dimension(),
+        'max_seq_length': st_model.max_seq_length,
+        'normalize': any(type(module).__name__ == 'Normalize' for module in st_model),
+        'quantized_file': None
+    }
+    
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        
+        quantized_path = os.path.join(output, 'model_int8.onnx')
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        config['quantized_file'] = os.path.basename(quantized_path)
+        logger.info(f"Quantized to int8: {quantized_path}")
+        paths.append(quantized_path)
+    
+    st_model.tokenizer.save_pretrained(output)
+    with open(os.path.join(output, ONNX_CONFIG_FILE), 'w') as f:
+        json.dump(config, f, indent=2)
+    
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=Config.EMBEDDING_MODEL, help='SentenceTransformer model to export')
+    parser.add_argument('--output', default='onnx_model', help='Output directory')
+    parser.add_argument('--quantize', action='store_true', help='Also write an int8-quantized model')
+    args = parser.parse_args()
+    
+    export(args.model, args.output, args.quantize)
+
+if __name__ == '__main__':
+    main()
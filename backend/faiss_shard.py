@@ -0,0 +1,97 @@
+"""
+Run a FAISS shard process for sharded vector search
+Each shard keeps its own FAISS store and serves the PDFs hashed to it;
+the Flask workers reach the shards through FAISS_SHARDS
+Shards refuse to start without a secret FAISS_SHARD_AUTHKEY (at least 32
+characters when listening on a non-loopback address): connections carry
+pickles, so the key is what keeps others from running code in the shard
+
+Usage:
+    python faiss_shard.py --address 10.0.0.5:7001 --index-path faiss_data/shards/0
+    python faiss_shard.py --local 4    # start 4 shards on Unix sockets (testing)
+"""
+
+import argparse
+import logging
+import os
+import secrets
+import subprocess
+import sys
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def serve(address, index_path):
+    """Load this shard's store and answer requests on address"""
+    # Read by Config at import time: this process holds a local store, not a shard client
+    os.environ['FAISS_INDEX_PATH'] = index_path
+    os.environ['FAISS_SHARDS'] = ''
+    # An unsharded startup sync would load every PDF into this shard; clients
+    # sync each shard with its own PDFs instead (ShardedVectorStore.sync_from_mongodb)
+    os.environ['FAISS_SYNC_ON_STARTUP'] = 'false'
+
+    from app import create_app
+    from app.config import Config
+    from app.utils.faiss_shards import serve_shard
+    from app.utils.faiss_store import faiss_store
+
+    app = create_app(os.getenv('FLASK_ENV', 'development'))
+
+    with app.app_context():
+        serve_shard(faiss_store, address, Config.FAISS_SHARD_AUTHKEY.encode('utf-8'))
+
+def run_local(count, base_path):
+    """Start count shard processes on Unix sockets under base_path"""
+    from app.config import Config
+
+    processes = []
+    addresses = []
+
+    # Local test shards get a one-off key unless one is configured
+    env = dict(os.environ)
+    if not Config.FAISS_SHARD_AUTHKEY:
+        env['FAISS_SHARD_AUTHKEY'] = secrets.token_hex(32)
+
+    for shard in range(count):
+        index_path = os.path.join(base_path, str(shard))
+        os.makedirs(index_path, exist_ok=True)
+        address = os.path.abspath(os.path.join(base_path, f"{shard}.sock"))
+        if os.path.exists(address):
+            os.remove(address)
+
+        processes.append(subprocess.Popen([
+            sys.executable, os.path.abspath(__file__),
+            '--address', address,
+            '--index-path', index_path
+        ], env=env))
+        addresses.append(address)
+
+    logger.info(f"Started {count} FAISS shards")
+    logger.info(f"FAISS_SHARDS={','.join(addresses)}")
+    if env['FAISS_SHARD_AUTHKEY'] != Config.FAISS_SHARD_AUTHKEY:
+        logger.info(f"FAISS_SHARD_AUTHKEY={env['FAISS_SHARD_AUTHKEY']}")
+
+    try:
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--address', help='host:port or Unix socket path to listen on')
+    parser.add_argument('--index-path', help='Directory holding this shard\'s FAISS data')
+    parser.add_argument('--local', type=int, help='Start this many local shard processes')
+    parser.add_argument('--base-path', default=os.path.join('faiss_data', 'shards'), help='Data directory for --local shards')
+    args = parser.parse_args()
+
+    if args.local:
+        run_local(args.local, args.base_path)
+    elif args.address and args.index_path:
+        serve(args.address, args.index_path)
+    else:
+        parser.error('either --local or both --address and --index-path are required')
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,19 @@
 """
 Initialize or rebuild FAISS index from existing MongoDB data
 Run this script after setting up the database
+
+Usage:
+    python init_faiss.py                  # full rebuild from MongoDB
+    python init_faiss.py --incremental    # add / drop only the PDFs that changed
+    python init_faiss.py --compact        # drop tombstones and re-train partitions
+    python init_faiss.py --rollback 12    # restore retained snapshot generation 12
+    python init_faiss.py --rollback 12 --shard 1    # only on shard 1 (FAISS_SHARDS)
 """
 
 from app import create_app
+from app.config import Config
 from app.utils.faiss_store import faiss_store
+import argparse
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -12,6 +21,16 @@ logger = logging.getLogger(__name__)
 
 def main():
     """Initialize FAISS from MongoDB"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--incremental', action='store_true', help='Sync only the PDFs that changed in MongoDB')
+    parser.add_argument('--compact', action='store_true', help='Compact the index instead of rebuilding it')
+    parser.add_argument('--rollback', type=int, metavar='GENERATION', help='Restore a retained snapshot generation')
+    parser.add_argument('--shard', type=int, help='With --rollback and FAISS_SHARDS, roll back only this shard')
+    args = parser.parse_args()
+    
+    if args.shard is not None and (args.rollback is None or not Config.FAISS_SHARDS):
+        parser.error('--shard needs --rollback and FAISS_SHARDS')
+    
     app = create_app('development')
     
     with app.app_context():
@@ -21,16 +40,29 @@ def main():
         stats = faiss_store.get_stats()
         logger.info(f"Current FAISS stats: {stats}")
         
-        # Rebuild from MongoDB
-        logger.info("Rebuilding FAISS index from MongoDB...")
-        success = faiss_store.rebuild_from_mongodb()
+        if args.rollback is not None:
+            logger.info(f"Rolling FAISS index back to snapshot generation {args.rollback}...")
+            if args.shard is not None:
+                success = faiss_store.rollback(args.rollback, shard=args.shard)
+            else:
+                success = faiss_store.rollback(args.rollback)
+        elif args.incremental:
+            logger.info("Syncing FAISS index with MongoDB...")
+            success = faiss_store.sync_from_mongodb()
+        elif args.compact:
+            logger.info("Compacting FAISS index...")
+            success = faiss_store.compact(background=False)
+        else:
+            # Rebuild from MongoDB
+            logger.info("Rebuilding FAISS index from MongoDB...")
+            success = faiss_store.rebuild_from_mongodb()
         
         if success:
             stats = faiss_store.get_stats()
-            logger.info(f"FAISS index rebuilt successfully!")
+            logger.info(f"FAISS index updated successfully!")
             logger.info(f"New stats: {stats}")
         else:
-            logger.error("Failed to rebuild FAISS index")
+            logger.error("Failed to update FAISS index")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,34 @@
+"""
+Convert MongoDB vectorstore embeddings from lists of doubles to packed binary
+Safe to run while the app is serving: documents in either format are read,
+and documents already converted are skipped
+
+Usage:
+    python migrate_embeddings.py                     # use EMBEDDING_STORAGE_DTYPE
+    python migrate_embeddings.py --dtype float16 --batch-size 2000
+"""
+
+from app import create_app
+from app.models.vectorstore import VectorStore, EMBEDDING_DTYPES
+import argparse
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main():
+    """Migrate stored embeddings to binary"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dtype', choices=sorted(EMBEDDING_DTYPES), help='Storage dtype (defaults to EMBEDDING_STORAGE_DTYPE)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Documents converted per bulk write')
+    args = parser.parse_args()
+    
+    app = create_app('development')
+    
+    with app.app_context():
+        logger.info("Migrating embeddings to binary storage...")
+        converted = VectorStore.migrate_embeddings(batch_size=args.batch_size, dtype=args.dtype)
+        logger.info(f"Converted {converted} embeddings")
+
+if __name__ == '__main__':
+    main()
@@ -10,9 +10,10 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-# Create app
-logger.info("🚀 Starting Engineering Chatbot Backend...")
-app = create_app(os.getenv('FLASK_ENV', 'development'))
+# Create app (not in spawned ingestion embedding processes, which import this module as __mp_main__)
+if __name__ != '__mp_main__':
+    logger.info("🚀 Starting Engineering Chatbot Backend...")
+    app = create_app(os.getenv('FLASK_ENV', 'development'))
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))